@@ -0,0 +1,351 @@
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import main  # noqa: E402
+
+
+def brute_force_collisions(
+    missiles: list[main.Entity], enemies: list[main.Entity]
+) -> list[tuple[main.Entity, main.Entity]]:
+    hits = []
+    for missile in missiles:
+        for enemy in enemies:
+            if missile.collide_with(enemy):
+                hits.append((missile, enemy))
+    return hits
+
+
+def build_scene(
+    count: int, rng: random.Random
+) -> tuple[list[main.Missile], list[main.Enemy]]:
+    width, height = main.INITIAL_SCREEN_SIZE
+    enemies = [
+        main.Enemy(
+            rng.choice(main.enemy_prototypes),
+            (rng.randint(0, width), rng.randint(0, height)),
+            main.INITIAL_SCREEN_SIZE,
+        )
+        for _ in range(count)
+    ]
+    missiles = [
+        main.Missile(
+            main.missile_prototype_map["missile_1"],
+            (rng.randint(0, width), rng.randint(0, height)),
+            "player",
+        )
+        for _ in range(count)
+    ]
+    return missiles, enemies
+
+
+def time_frames(step, frames: int) -> float:
+    start = time.perf_counter()
+    for _ in range(frames):
+        step()
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def bench_collision(counts: list[int], frames: int, seed: int) -> None:
+    grid = main.SpatialHash(64)
+    print(f"{'entities':>10} {'brute ms':>10} {'grid ms':>10} {'speedup':>8}")
+    for count in counts:
+        missiles, enemies = build_scene(count, random.Random(seed))
+        brute_ms = time_frames(lambda: brute_force_collisions(missiles, enemies), frames)
+        grid_ms = time_frames(
+            lambda: main.find_collisions(missiles, enemies, grid), frames
+        )
+        print(
+            f"{count * 2:>10} {brute_ms:>10.3f} {grid_ms:>10.3f} "
+            f"{brute_ms / grid_ms:>7.1f}x"
+        )
+
+
+def bench_spawn(count: int) -> None:
+    meta = main.enemies_meta_data["basic_1"]
+    prototype = main.enemy_prototype_map["basic_1"]
+    position = (400, 400)
+
+    start = time.perf_counter()
+    for _ in range(count):
+        image = main.load_image(meta["image"])
+        main.Entity(meta["image"], meta["size"], position, image=image)
+    uncached_us = (time.perf_counter() - start) / count * 1e6
+
+    start = time.perf_counter()
+    for _ in range(count):
+        main.Enemy(prototype, position, main.INITIAL_SCREEN_SIZE)
+    prototype_us = (time.perf_counter() - start) / count * 1e6
+
+    print(f"{'spawn path':>12} {'us/spawn':>10}")
+    print(f"{'uncached':>12} {uncached_us:>10.1f}")
+    print(f"{'prototype':>12} {prototype_us:>10.1f}")
+
+
+class ProjectileArrays:
+    # Structure-of-arrays projectiles, advanced and culled in whole-array steps.
+    def __init__(self, capacity: int) -> None:
+        np = main.np
+        self.position = np.zeros((capacity, 2), dtype=np.float32)
+        self.direction = np.zeros((capacity, 2), dtype=np.float32)
+        self.speed = np.zeros(capacity, dtype=np.float32)
+        self.half_size = np.zeros((capacity, 2), dtype=np.float32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def spawn(
+        self,
+        prototype: main.EntityPrototype,
+        position: tuple[float, float],
+        direction: tuple[float, float],
+    ) -> int | None:
+        if not self.free:
+            return None
+        index = self.free.pop()
+        self.position[index] = position
+        self.direction[index] = direction
+        self.speed[index] = prototype.speed
+        self.half_size[index] = (
+            prototype.image.get_width() / 2,
+            prototype.image.get_height() / 2,
+        )
+        self.alive[index] = True
+        return index
+
+    def kill(self, index: int) -> None:
+        if self.alive[index]:
+            self.alive[index] = False
+            self.speed[index] = 0
+            self.free.append(index)
+
+    def step(self, dt: float) -> None:
+        self.position += self.direction * (self.speed * dt)[:, None]
+
+    def cull(self, bounds: main.pygame.Rect) -> None:
+        low = self.position - self.half_size
+        high = self.position + self.half_size
+        outside = self.alive & (
+            (high[:, 0] < bounds.left)
+            | (low[:, 0] > bounds.right)
+            | (high[:, 1] < bounds.top)
+            | (low[:, 1] > bounds.bottom)
+        )
+        for index in main.np.flatnonzero(outside).tolist():
+            self.kill(index)
+
+
+def bench_batched(counts: list[int], frames: int, seed: int) -> None:
+    if main.np is None:
+        print("batched benchmark skipped: numpy is not installed")
+        return
+    prototype = main.missile_prototype_map["missile_1"]
+    bounds = main.screen.get_rect()
+    dt = 1 / main.FPS
+    print(f"{'projectiles':>12} {'objects ms':>11} {'arrays ms':>10} {'speedup':>8}")
+    for count in counts:
+        rng = random.Random(seed)
+        positions = [
+            (rng.uniform(0, bounds.width), rng.uniform(0, bounds.height))
+            for _ in range(count)
+        ]
+        missiles = [main.Missile(prototype, position, "player") for position in positions]
+
+        def step_objects() -> None:
+            for missile in missiles:
+                missile.update(dt)
+            main.sync_rects(missiles)
+            missiles[:] = [
+                missile
+                for missile in missiles
+                if missile.rect.bottom >= 0 and missile.rect.top <= bounds.height
+            ]
+
+        arrays = ProjectileArrays(count)
+        for position in positions:
+            arrays.spawn(prototype, position, (0, -1))
+
+        def step_arrays() -> None:
+            arrays.step(dt)
+            arrays.cull(bounds)
+
+        objects_ms = time_frames(step_objects, frames)
+        arrays_ms = time_frames(step_arrays, frames)
+        print(
+            f"{count:>12} {objects_ms:>11.3f} {arrays_ms:>10.3f} "
+            f"{objects_ms / arrays_ms:>7.1f}x"
+        )
+
+
+def bench_background(frames: int) -> None:
+    game = main.Game(main.screen, 0)
+    game.start_session()
+    surface = main.pygame.Surface(main.screen.get_size()).convert()
+
+    def draw_layers() -> None:
+        surface.fill(main.LIGHT_GRAY)
+        game.fixed_background.draw(surface)
+        game.star_background.draw(surface)
+        game.background.draw(surface)
+
+    def draw_composited() -> None:
+        game.background_compositor.draw(surface)
+
+    layers_ms = time_frames(draw_layers, frames)
+    composited_ms = time_frames(draw_composited, frames)
+    print(f"{'background':>12} {'ms/frame':>10}")
+    print(f"{'layers':>12} {layers_ms:>10.3f}")
+    print(f"{'composited':>12} {composited_ms:>10.3f}")
+
+
+def bench_draw(counts: list[int], frames: int, seed: int) -> None:
+    surface = main.pygame.Surface(main.screen.get_size()).convert()
+    layers = main.RenderLayers(surface.get_rect())
+    profiler = main.FrameProfiler()
+    print(f"{'sprites':>10} {'blit ms':>10} {'layers ms':>10} {'speedup':>8}")
+    for count in counts:
+        missiles, enemies = build_scene(count, random.Random(seed))
+
+        def draw_each() -> None:
+            for enemy in enemies:
+                enemy.draw(surface)
+            for missile in missiles:
+                missile.draw(surface)
+
+        def draw_layers() -> None:
+            layers.add_entities(main.LAYER_ENEMIES, enemies)
+            layers.add_entities(main.LAYER_PROJECTILES, missiles)
+            layers.draw(surface, profiler)
+
+        blit_ms = time_frames(draw_each, frames)
+        layers_ms = time_frames(draw_layers, frames)
+        print(
+            f"{count * 2:>10} {blit_ms:>10.3f} {layers_ms:>10.3f} "
+            f"{blit_ms / layers_ms:>7.1f}x"
+        )
+
+
+def scan_and_steer(
+    missiles: list[main.HomingMissile], enemies: list[main.Enemy], dt: float
+) -> None:
+    for missile in missiles:
+        target = min(
+            enemies,
+            key=lambda enemy: (enemy.x - missile.x) ** 2 + (enemy.y - missile.y) ** 2,
+        )
+        missile.direction.update(target.x - missile.x, target.y - missile.y)
+        if missile.direction.magnitude() > 0:
+            missile.direction = missile.direction.normalize()
+        missile.vx = missile.direction.x * missile.speed
+        missile.vy = missile.direction.y * missile.speed
+
+
+def bench_homing(counts: list[int], frames: int, seed: int) -> None:
+    prototype = main.missile_prototype_map["missile_2"]
+    prototype.bake_rotations()
+    dt = 1 / main.TICK_RATE
+    print(f"{'missiles':>10} {'scan ms':>10} {'guided ms':>10} {'speedup':>8}")
+    for count in counts:
+        rng = random.Random(seed)
+        _, enemies = build_scene(count // 4 or 1, rng)
+        width, height = main.INITIAL_SCREEN_SIZE
+        missiles = [
+            main.HomingMissile(
+                prototype, (rng.uniform(0, width), rng.uniform(0, height)), "player"
+            )
+            for _ in range(count)
+        ]
+        guidance = main.HomingGuidance()
+        scan_ms = time_frames(lambda: scan_and_steer(missiles, enemies, dt), frames)
+        guided_ms = time_frames(lambda: guidance.steer(missiles, enemies, dt), frames)
+        print(
+            f"{count:>10} {scan_ms:>10.3f} {guided_ms:>10.3f} "
+            f"{scan_ms / guided_ms:>7.1f}x"
+        )
+
+
+def mask_only(a: main.Entity, b: main.Entity) -> bool:
+    offset = (int(b.rect.x - a.rect.x), int(b.rect.y - a.rect.y))
+    return a.mask.overlap(b.mask, offset) is not None
+
+
+def aabb_then_mask(a: main.Entity, b: main.Entity) -> bool:
+    return a.collide_with(b)
+
+
+def bounds_then_mask(a: main.Entity, b: main.Entity) -> bool:
+    return main.narrow_phase(a.rect, a.mask, b.rect, b.mask, main.COLLIDE_BOUNDS)
+
+
+def circles(a: main.Entity, b: main.Entity) -> bool:
+    return main.narrow_phase(a.rect, a.mask, b.rect, b.mask, main.COLLIDE_CIRCLE)
+
+
+NARROW_TIERS = (
+    ("mask", mask_only),
+    ("aabb+mask", aabb_then_mask),
+    ("bounds", bounds_then_mask),
+    ("circle", circles),
+)
+
+
+def bench_narrow(counts: list[int], frames: int, seed: int) -> None:
+    # The narrow phase only sees pairs the broad phase let through, so time
+    # the tiers on AABB-overlapping pairs from a scene packed into a quarter
+    # of the screen.
+    header = " ".join(f"{name:>10}" for name, _ in NARROW_TIERS)
+    print(f"{'entities':>10} {'pairs':>8} {'hits':>6} {header}  (us/pair)")
+    for count in counts:
+        missiles, enemies = build_scene(count, random.Random(seed))
+        for entity in (*missiles, *enemies):
+            entity.x /= 2
+            entity.y /= 2
+        main.sync_rects(missiles)
+        main.sync_rects(enemies)
+        pairs = [
+            (missile, enemy)
+            for missile in missiles
+            for enemy in enemies
+            if missile.rect.colliderect(enemy.rect)
+        ]
+        if not pairs:
+            continue
+        hits = sum(mask_only(a, b) for a, b in pairs)
+        timings = []
+        for _, check in NARROW_TIERS:
+            ms = time_frames(lambda: [check(a, b) for a, b in pairs], frames)
+            timings.append(ms * 1000 / len(pairs))
+        columns = " ".join(f"{us:>10.3f}" for us in timings)
+        print(f"{count * 2:>10} {len(pairs):>8} {hits:>6} {columns}")
+
+
+BENCHMARKS = ("collision", "spawn", "batched", "background", "draw", "homing", "narrow")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Space Invaders benchmarks")
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[10, 50, 100, 250, 500]
+    )
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spawns", type=int, default=500)
+    parser.add_argument("--only", choices=BENCHMARKS, action="append")
+    args = parser.parse_args()
+    selected = args.only or BENCHMARKS
+    if "collision" in selected:
+        bench_collision(args.counts, args.frames, args.seed)
+    if "spawn" in selected:
+        bench_spawn(args.spawns)
+    if "batched" in selected:
+        bench_batched([count * 10 for count in args.counts], args.frames, args.seed)
+    if "background" in selected:
+        bench_background(args.frames * 10)
+    if "draw" in selected:
+        bench_draw(args.counts, args.frames * 5, args.seed)
+    if "homing" in selected:
+        bench_homing([count * 2 for count in args.counts], args.frames, args.seed)
+    if "narrow" in selected:
+        bench_narrow(args.counts, args.frames, args.seed)
@@ -0,0 +1,195 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np  # noqa: E402
+
+import main  # noqa: E402
+
+pygame = main.pygame
+
+MOVES = (
+    (),
+    (pygame.K_a,),
+    (pygame.K_d,),
+    (pygame.K_w,),
+    (pygame.K_s,),
+)
+ACTIONS = [
+    main.KeyState(frozenset(move + ((pygame.K_SPACE,) if fire else ())))
+    for fire in (False, True)
+    for move in MOVES
+]
+
+MAX_ENEMIES = 16
+MAX_MISSILES = 32
+PLAYER_FEATURES = 4
+ENTITY_FEATURES = 3
+STATE_SIZE = PLAYER_FEATURES + (MAX_ENEMIES + MAX_MISSILES) * ENTITY_FEATURES
+
+
+def buffer_spec(
+    observation: str, pixel_size: tuple[int, int] | None = None
+) -> tuple[tuple[int, ...], type]:
+    if observation == "state":
+        return (STATE_SIZE,), np.float32
+    if observation == "pixels":
+        width, height = pixel_size or main.INITIAL_SCREEN_SIZE
+        return (height, width, 4), np.uint8
+    raise ValueError(f"unknown observation type {observation!r}")
+
+
+class SpaceInvaderEnv:
+    def __init__(
+        self,
+        observation: str = "state",
+        frame_skip: int = 1,
+        max_steps: int = 0,
+        pixel_size: tuple[int, int] | None = None,
+        difficulty: dict[str, float] | None = None,
+        buffer: np.ndarray | None = None,
+    ) -> None:
+        shape, dtype = buffer_spec(observation, pixel_size)
+        self.observation = observation
+        self.frame_skip = frame_skip
+        self.max_steps = max_steps
+        self.dt = 1 / main.TICK_RATE
+        self.action_count = len(ACTIONS)
+        self.buffer = buffer if buffer is not None else np.zeros(shape, dtype)
+
+        # Surfaces draw straight into numpy-owned BGRA buffers, so pixel
+        # observations are views of the frame rather than copies of it.
+        width, height = main.INITIAL_SCREEN_SIZE
+        if observation == "pixels" and pixel_size is None:
+            self.frame = self.buffer
+        else:
+            self.frame = np.zeros((height, width, 4), np.uint8)
+        self.surface = pygame.image.frombuffer(self.frame, (width, height), "BGRA")
+        self.pixels = None
+        if observation == "pixels" and pixel_size is not None:
+            self.pixels = pygame.image.frombuffer(self.buffer, pixel_size, "BGRA")
+        self.scale = np.array([width, height], np.float32)
+
+        main.assets.wait()
+        self.game = main.Game(self.surface, None, difficulty)
+        self.steps = 0
+        self.kills = 0
+        self.lives = 0
+
+    def reset(self, seed: int | None = None) -> tuple[np.ndarray, dict]:
+        game = self.game
+        if seed is not None:
+            game.seed = seed
+            game.rng.seed(seed)
+        game.start_session()
+        game.scene = main.GAME_SCENE
+        game.kills = 0
+        self.steps = 0
+        self.kills = 0
+        self.lives = game.player_life
+        return self.observe(), self.info()
+
+    def step(self, action: int) -> tuple[np.ndarray, float, bool, bool, dict]:
+        game = self.game
+        keys = ACTIONS[action]
+        for _ in range(self.frame_skip):
+            main.step(game, self.dt, keys)
+            if game.scene != main.GAME_SCENE:
+                break
+        self.steps += 1
+
+        reward = (game.kills - self.kills) - (self.lives - game.player_life)
+        self.kills = game.kills
+        self.lives = game.player_life
+        terminated = game.scene != main.GAME_SCENE
+        truncated = self.max_steps > 0 and self.steps >= self.max_steps
+        return self.observe(), float(reward), terminated, truncated, self.info()
+
+    def info(self) -> dict:
+        return {"kills": self.kills, "lives": self.lives, "steps": self.steps}
+
+    def observe(self) -> np.ndarray:
+        if self.observation == "pixels":
+            return self.observe_pixels()
+        return self.observe_state()
+
+    def observe_pixels(self) -> np.ndarray:
+        main.render(self.game, self.surface)
+        if self.pixels is not None:
+            pygame.transform.scale(self.surface, self.pixels.get_size(), self.pixels)
+        # BGRA in memory; a reversed-channel view gives RGB without a copy.
+        return self.buffer[:, :, 2::-1]
+
+    def observe_state(self) -> np.ndarray:
+        game = self.game
+        state = self.buffer
+        state.fill(0.0)
+        player = game.player_ship
+        state[0] = player.x / self.scale[0]
+        state[1] = player.y / self.scale[1]
+        state[2] = game.player_life
+        state[3] = max(player.missile_cooldown, 0.0)
+
+        offset = PLAYER_FEATURES
+        enemies = sorted(game.enemy_container, key=lambda enemy: -enemy.y)
+        self.write_entities(state, offset, enemies[:MAX_ENEMIES])
+        offset += MAX_ENEMIES * ENTITY_FEATURES
+        self.write_entities(state, offset, game.missile_pool.active[:MAX_MISSILES])
+        return state
+
+    def write_entities(self, state: np.ndarray, offset: int, entities: list) -> None:
+        if not entities:
+            return
+        block = state[offset:offset + len(entities) * ENTITY_FEATURES].reshape(
+            -1, ENTITY_FEATURES
+        )
+        block[:, :2] = [(entity.x, entity.y) for entity in entities]
+        block[:, :2] /= self.scale
+        block[:, 2] = 1.0
+
+
+class VectorEnv:
+    def __init__(self, count: int, **kwargs) -> None:
+        shape, dtype = buffer_spec(
+            kwargs.get("observation", "state"), kwargs.get("pixel_size")
+        )
+        self.buffers = np.zeros((count,) + shape, dtype)
+        self.envs = [
+            SpaceInvaderEnv(**kwargs, buffer=self.buffers[index])
+            for index in range(count)
+        ]
+        if self.envs[0].observation == "pixels":
+            self.observations = self.buffers[..., 2::-1]
+        else:
+            self.observations = self.buffers
+        self.rewards = np.zeros(count, np.float32)
+        self.terminated = np.zeros(count, bool)
+        self.truncated = np.zeros(count, bool)
+
+    def __len__(self) -> int:
+        return len(self.envs)
+
+    def reset(self, seed: int | None = None) -> tuple[np.ndarray, list[dict]]:
+        infos = []
+        for index, env in enumerate(self.envs):
+            _, info = env.reset(None if seed is None else seed + index)
+            infos.append(info)
+        return self.observations, infos
+
+    def step(
+        self, actions
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, list[dict]]:
+        infos = []
+        for index, (env, action) in enumerate(zip(self.envs, actions)):
+            _, reward, terminated, truncated, info = env.step(int(action))
+            if terminated or truncated:
+                # Finished environments restart immediately, so the returned
+                # observation is the first one of the next episode.
+                info = {**info, "final_info": dict(info)}
+                env.reset()
+            self.rewards[index] = reward
+            self.terminated[index] = terminated
+            self.truncated[index] = truncated
+            infos.append(info)
+        return self.observations, self.rewards, self.terminated, self.truncated, infos
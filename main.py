@@ -1,22 +1,79 @@
+import argparse
+import contextlib
+import csv
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
 import random
+import struct
+import sys
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import pygame
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 INITIAL_SCREEN_SIZE = (800, 800)
 MIN_SCREEN_SIZE = (400, 400)
 FPS = 60
+TICK_RATE = 120
+MAX_TICKS_PER_FRAME = 8
+MAX_FRAME_TIME = 0.25
+ROTATION_STEP = 5
+HOMING_TURN_RATE = 270
+RESIZE_DEBOUNCE = 0.15
+ANIMATION_BATCH_SIZE = 32
+AUDIO_QUEUE_SIZE = 64
 TITLE = "Space Invaders"
+BUNDLE_PATH = os.environ.get("SPACE_INVADER_BUNDLE", "assets/bundle.bin")
+WAVES_PATH = os.environ.get("SPACE_INVADER_WAVES", "assets/waves.json")
+BUNDLE_MAGIC = b"SIAB"
+BUNDLE_VERSION = 1
+BUNDLE_HEADER = struct.Struct("<4sII")
+REPLAY_MAGIC = b"SIRL"
+REPLAY_VERSION = 4
+REPLAY_HEADER = struct.Struct("<4sHQ")
+REPLAY_RUN = struct.Struct("<HdI")
+ASE_MAGIC = 0xA5E0
+ASE_FRAME_MAGIC = 0xF1FA
+ASE_HEADER_SIZE = 128
+ASE_HEADER = struct.Struct("<IHH")
+ASE_FRAME = struct.Struct("<IHHH")
 
 # Constants
 MENU_SCENE = 0
 GAME_SCENE = 1
 TRANSITION_TO_GAME_OVER_SCENE = 2
 GAME_OVER_SCENE = 3
+LOADING_SCENE = 4
+
+LAYER_BACKGROUND = 0
+LAYER_ENEMIES = 1
+LAYER_PROJECTILES = 2
+LAYER_PLAYER = 3
+LAYER_OVERLAY = 4
+LAYER_HUD = 5
+LAYER_PHASES = ("background", "entities", "entities", "entities", "entities", "hud")
+
+COLLIDE_MASK = "mask"
+COLLIDE_BOUNDS = "bounds"
+COLLIDE_CIRCLE = "circle"
+COLLISION_MODES = (COLLIDE_MASK, COLLIDE_BOUNDS, COLLIDE_CIRCLE)
 
 # Colors
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 LIGHT_GRAY = (200, 200, 200)
+COLORKEY = (255, 0, 255)
 
 
 def load_image(path: str) -> pygame.Surface:
@@ -27,6 +84,251 @@ def scale_image_by_size(image: pygame.Surface, size: tuple[int, int]) -> pygame.
     return pygame.transform.scale(image, size)
 
 
+class AssetBundle:
+    def __init__(self, path: str) -> None:
+        self.pages: list[pygame.Surface] = []
+        self.regions: dict[tuple[str, tuple[int, int]], tuple[int, pygame.Rect]] = {}
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, index_size = BUNDLE_HEADER.unpack_from(data, 0)
+            if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+                raise ValueError(f"{path} is not a version {BUNDLE_VERSION} asset bundle")
+            start = BUNDLE_HEADER.size
+            index = json.loads(data[start:start + index_size])
+            base = start + index_size
+            for page in index["pages"]:
+                offset = base + page["offset"]
+                view = memoryview(data)[offset:offset + page["length"]]
+                raw = pygame.image.frombuffer(view, tuple(page["size"]), "RGBA")
+                self.pages.append(raw.convert_alpha())
+                del raw
+                view.release()
+        finally:
+            data.close()
+        for entry in index["images"]:
+            self.regions[(entry["path"], tuple(entry["size"]))] = (
+                entry["page"],
+                pygame.Rect(entry["rect"]),
+            )
+
+    def __contains__(self, key: tuple[str, tuple[int, int]]) -> bool:
+        return key in self.regions
+
+    def get(self, path: str, size: tuple[int, int]) -> pygame.Surface | None:
+        region = self.regions.get((path, tuple(size)))
+        if region is None:
+            return None
+        page, rect = region
+        image = self.pages[page].subsurface(rect)
+        if rect.size != tuple(size):
+            image = scale_image_by_size(image, size)
+        return image
+
+
+def load_asset_bundle(path: str) -> AssetBundle | None:
+    if not path or not os.path.exists(path):
+        return None
+    return AssetBundle(path)
+
+
+asset_bundle: AssetBundle | None = None
+requested_images: dict[tuple[str, tuple[int, int]], None] = {}
+
+
+class AssetHandle:
+    def __init__(
+        self,
+        future: Future | None,
+        size: tuple[int, int] | None = None,
+        finalize=None,
+        value=None,
+    ) -> None:
+        self.future = future
+        self.size = size
+        self.finalize = finalize
+        self.value = value
+
+    def ready(self) -> bool:
+        return self.future is None or self.future.done()
+
+    def get(self):
+        if self.future is not None:
+            result = self.future.result()
+            self.value = self.finalize(result) if self.finalize else result
+            self.future = None
+        return self.value
+
+    def get_rect(self) -> pygame.Rect:
+        return pygame.Rect((0, 0), self.size)
+
+
+def decode_image(path: str, size: tuple[int, int], flip: bool) -> pygame.Surface:
+    image = scale_image_by_size(pygame.image.load(path), size)
+    if flip:
+        image = pygame.transform.flip(image, True, False)
+    return image
+
+
+def extract_image(
+    bundle: AssetBundle, path: str, size: tuple[int, int], flip: bool
+) -> pygame.Surface:
+    # Pages are only read after load, so workers can cut and scale them freely.
+    image = bundle.get(path, size)
+    if flip:
+        image = pygame.transform.flip(image, True, False)
+    return image
+
+
+def decode_sound(path: str, volume: float) -> pygame.mixer.Sound:
+    sound = pygame.mixer.Sound(path)
+    sound.set_volume(volume)
+    return sound
+
+
+class AssetManager:
+    def __init__(self, workers: int = 4) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="assets"
+        )
+        self.handles: dict[tuple, AssetHandle] = {}
+
+    def image(
+        self, path: str, size: tuple[int, int], flip: bool = False
+    ) -> AssetHandle:
+        size = tuple(size)
+        key = ("image", path, size, flip)
+        handle = self.handles.get(key)
+        if handle is not None:
+            return handle
+        requested_images[(path, size)] = None
+        if asset_bundle is not None and (path, size) in asset_bundle:
+            future = self.executor.submit(extract_image, asset_bundle, path, size, flip)
+        else:
+            future = self.executor.submit(decode_image, path, size, flip)
+        handle = AssetHandle(future, size, finalize=pygame.Surface.convert_alpha)
+        self.handles[key] = handle
+        return handle
+
+    def images(
+        self, paths: list[str], size: tuple[int, int], flip: bool = False
+    ) -> list[AssetHandle]:
+        return [self.image(path, size, flip) for path in paths]
+
+    def sound(self, path: str, volume: float = 1.0) -> AssetHandle:
+        key = ("sound", path, volume)
+        handle = self.handles.get(key)
+        if handle is None:
+            handle = AssetHandle(self.executor.submit(decode_sound, path, volume))
+            self.handles[key] = handle
+        return handle
+
+    def wait(self, handles: list[AssetHandle] | None = None) -> None:
+        for handle in list(self.handles.values()) if handles is None else handles:
+            handle.get()
+
+    @staticmethod
+    def progress(handles: list[AssetHandle]) -> float:
+        if not handles:
+            return 1.0
+        return sum(handle.ready() for handle in handles) / len(handles)
+
+
+class AudioMixer:
+    def __init__(
+        self,
+        sounds: dict[str, AssetHandle],
+        meta_data: dict[str, dict],
+        budget: dict[str, int],
+        queue_size: int = AUDIO_QUEUE_SIZE,
+    ) -> None:
+        self.sounds = sounds
+        self.meta_data = meta_data
+        self.queue: deque[str] = deque()
+        self.queue_size = queue_size
+        self.clock = 0.0
+        self.last_played = {name: -math.inf for name in sounds}
+        self.enabled = pygame.mixer.get_init() is not None
+        # Each category owns a fixed slice of reserved channels, so heavy fire
+        # can only ever take the combat voices away from itself.
+        self.channels: dict[str, list[pygame.mixer.Channel]] = {}
+        self.voices: dict[pygame.mixer.Channel, tuple[int, float]] = {}
+        if self.enabled:
+            total = sum(budget.values())
+            pygame.mixer.set_num_channels(max(total, pygame.mixer.get_num_channels()))
+            pygame.mixer.set_reserved(total)
+            start = 0
+            for category, count in budget.items():
+                self.channels[category] = [
+                    pygame.mixer.Channel(i) for i in range(start, start + count)
+                ]
+                start += count
+        self.played = 0
+        self.stolen = 0
+        self.dropped = 0
+        self.limited = 0
+
+    def post(self, name: str) -> None:
+        if len(self.queue) >= self.queue_size:
+            self.dropped += 1
+            return
+        self.queue.append(name)
+
+    def update(self, dt: float) -> None:
+        self.clock += dt
+        queue = self.queue
+        while queue:
+            self.play(queue.popleft())
+
+    def play(self, name: str) -> None:
+        meta = self.meta_data[name]
+        if self.clock - self.last_played[name] < meta["min_interval"]:
+            self.limited += 1
+            return
+        sound = self.sounds[name]
+        if not self.enabled or not sound.ready():
+            self.dropped += 1
+            return
+        channel = self.find_channel(self.channels[meta["category"]], meta["priority"])
+        if channel is None:
+            self.dropped += 1
+            return
+        channel.play(sound.get())
+        self.voices[channel] = (meta["priority"], self.clock)
+        self.last_played[name] = self.clock
+        self.played += 1
+
+    def find_channel(
+        self, channels: list[pygame.mixer.Channel], priority: int
+    ) -> pygame.mixer.Channel | None:
+        victim = None
+        for channel in channels:
+            if not channel.get_busy():
+                return channel
+            voice_priority, started = self.voices[channel]
+            if voice_priority > priority:
+                continue
+            if victim is None or (voice_priority, started) < self.voices[victim]:
+                victim = channel
+        if victim is not None:
+            # Steal the lowest-priority, oldest voice in the category.
+            victim.stop()
+            self.stolen += 1
+        return victim
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "voices_played": self.played,
+            "voices_stolen": self.stolen,
+            "voices_dropped": self.dropped,
+            "voices_limited": self.limited,
+        }
+
+
+def load_scaled(path: str, size: tuple[int, int]) -> pygame.Surface:
+    return assets.image(path, size).get()
+
+
 def create_outline(surface: pygame.Surface) -> pygame.Surface:
     result = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
     s = surface.copy()
@@ -41,12 +343,384 @@ def create_outline(surface: pygame.Surface) -> pygame.Surface:
 
     return result
 
+
+sprite_cache: dict[
+    tuple[str, tuple[int, int], bool], tuple[pygame.Surface, pygame.mask.Mask]
+] = {}
+
+
+def get_sprite(
+    image_path: str, size: tuple[int, int], outline: bool = True
+) -> tuple[pygame.Surface, pygame.mask.Mask]:
+    key = (image_path, size, outline)
+    if key not in sprite_cache:
+        image = load_scaled(image_path, size)
+        # The outline is decoration; collisions use the sprite's own pixels.
+        mask = pygame.mask.from_surface(image)
+        if outline:
+            image = create_outline(image)
+        sprite_cache[key] = (image, mask)
+    return sprite_cache[key]
+
+
+class CollisionShape:
+    def __init__(self, mask: pygame.mask.Mask) -> None:
+        rects = mask.get_bounding_rects()
+        if rects:
+            self.bounds = rects[0].unionall(rects[1:])
+            self.left, self.top, self.right, self.bottom = (
+                self.bounds.left,
+                self.bounds.top,
+                self.bounds.right,
+                self.bounds.bottom,
+            )
+        else:
+            # Inverted bounds so an empty mask fails every tier.
+            self.bounds = pygame.Rect(0, 0, 0, 0)
+            self.left = self.top = math.inf
+            self.right = self.bottom = -math.inf
+        self.center_x = self.bounds.x + self.bounds.width / 2
+        self.center_y = self.bounds.y + self.bounds.height / 2
+        self.radius = (self.bounds.width + self.bounds.height) / 4 if rects else -math.inf
+
+
+collision_shapes: dict[pygame.mask.Mask, CollisionShape] = {}
+
+
+def collision_shape(mask: pygame.mask.Mask) -> CollisionShape:
+    shape = collision_shapes.get(mask)
+    if shape is None:
+        shape = collision_shapes[mask] = CollisionShape(mask)
+    return shape
+
+
+def narrow_phase(
+    rect: pygame.FRect,
+    mask: pygame.mask.Mask,
+    other_rect: pygame.FRect,
+    other_mask: pygame.mask.Mask,
+    mode: str = COLLIDE_MASK,
+) -> bool:
+    if not rect.colliderect(other_rect):
+        return False
+    # Mask.overlap truncates offsets, so the tighter tiers use the same ints.
+    dx = int(other_rect.x - rect.x)
+    dy = int(other_rect.y - rect.y)
+    if mode == COLLIDE_MASK:
+        return mask.overlap(other_mask, (dx, dy)) is not None
+    shape = collision_shape(mask)
+    other = collision_shape(other_mask)
+    if mode == COLLIDE_CIRCLE:
+        distance_x = other.center_x + dx - shape.center_x
+        distance_y = other.center_y + dy - shape.center_y
+        reach = shape.radius + other.radius
+        if reach <= 0:
+            return False
+        return distance_x * distance_x + distance_y * distance_y < reach * reach
+    if (
+        other.left + dx >= shape.right
+        or other.right + dx <= shape.left
+        or other.top + dy >= shape.bottom
+        or other.bottom + dy <= shape.top
+    ):
+        return False
+    return mask.overlap(other_mask, (dx, dy)) is not None
+
+
+class EntityPrototype:
+    def __init__(self, image_path: str, image_size: tuple[int, int], speed: float) -> None:
+        self.image_path = image_path
+        self.image_size = image_size
+        self.speed = speed
+        self._image: pygame.Surface | None = None
+        self._mask: pygame.mask.Mask | None = None
+        self.rotations: dict[int, tuple[pygame.Surface, pygame.mask.Mask]] = {}
+        self.rotation_step = ROTATION_STEP
+
+    @property
+    def image(self) -> pygame.Surface:
+        if self._image is None:
+            self._image, self._mask = get_sprite(self.image_path, self.image_size)
+        return self._image
+
+    @property
+    def mask(self) -> pygame.mask.Mask:
+        if self._mask is None:
+            self._image, self._mask = get_sprite(self.image_path, self.image_size)
+        return self._mask
+
+    def bake_rotations(self, step: int = ROTATION_STEP) -> None:
+        self.rotation_step = step
+        self.rotations = {}
+        raw, _ = get_sprite(self.image_path, self.image_size, outline=False)
+        for heading in range(0, 360, step):
+            # Sprites point up, which is a heading of -90 degrees on screen.
+            image = pygame.transform.rotate(self.image, -heading - 90)
+            mask = pygame.mask.from_surface(pygame.transform.rotate(raw, -heading - 90))
+            self.rotations[heading] = image, mask
+
+    def rotation_key(self, heading: float) -> int:
+        step = self.rotation_step
+        return round(heading / step) * step % 360
+
+    def rotation(self, heading: float) -> tuple[pygame.Surface, pygame.mask.Mask]:
+        if not self.rotations:
+            self.bake_rotations(self.rotation_step)
+        return self.rotations[self.rotation_key(heading)]
+
+
+def load_wave_data(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def build_prototypes(meta_data: dict[str, dict]) -> dict[str, EntityPrototype]:
+    return {
+        name: EntityPrototype(meta["image"], meta["size"], meta["speed"])
+        for name, meta in meta_data.items()
+    }
+
 class Game:
-    def __init__(self, screen: pygame.Surface) -> None:
+    def __init__(
+        self,
+        screen: pygame.Surface,
+        seed: int | None = None,
+        difficulty: dict[str, float] | None = None,
+    ) -> None:
+        unknown = set(difficulty or ()) - set(difficulty_meta_data)
+        if unknown:
+            raise ValueError(f"unknown difficulty parameters: {sorted(unknown)}")
+        self.difficulty = {**difficulty_meta_data, **(difficulty or {})}
         self.screen_rect = screen.get_rect()
         self.screen_size = INITIAL_SCREEN_SIZE
         self.font = pygame.Font("assets/fonts/PixelMplus12-Regular.ttf", size=36)
-        self.scene = MENU_SCENE
+        self.scene = LOADING_SCENE
+        self.loading_target = MENU_SCENE
+        self.running = True
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.rng = random.Random(self.seed)
+        self.collision_grid = SpatialHash(64)
+        self.collision_mode = COLLIDE_MASK
+        self.guidance = HomingGuidance()
+        self.enemy_pool = EnemyPool()
+        self.waves = WaveScheduler(wave_data)
+        self.missile_pool = MissilePool(256)
+        self.profiler = FrameProfiler()
+        self.renderer = DirtyRectRenderer(self.screen_size)
+        self.layers = RenderLayers(self.screen_rect)
+        self.animations = AnimationSystem(animation_clips)
+        self.menu_scene_animation = self.animations.play("menu_scene_bg")
+        self.menu_scene_alien_animation = self.animations.play("menu_scene_alien_bg")
+        self.cursor_animation = self.animations.play("cursor")
+
+        self.background: AnimatedBackground | None = None
+        self.star_background: MovedBackground | None = None
+        self.fixed_background: FixedBackground | None = None
+        self.background_compositor: BackgroundCompositor | None = None
+
+        self.increase_difficulty_text_rect = text_cache.render(
+            self.font, "Game difficulty has been increased.", False, WHITE
+        ).get_rect()
+        self.show_increase_difficulty_hidden_count = 2
+
+        self.overlap_surface = pygame.Surface(self.screen_size)
+        self.overlap_surface.fill(BLACK)
+
+        self.missile_factory_cursor = Counter(0.2, 3)
+        self.player_ship: PlayerShip | None = None
+        self.player_life = 0
+        self.enemy_container: list[Enemy] = []
+        self.alpha = 0
+        self.sessions = 0
+        self.kills = 0
+        self.session_time = 0.0
+        self.survival_times: list[float] = []
+        self.interpolation = 1.0
+        reset_menu_counters()
+
+    def load_backgrounds(self) -> None:
+        self.background = AnimatedBackground(
+            background_meta_data["animated"], self.screen_size, self.animations
+        )
+        self.star_background = MovedBackground(
+            background_meta_data["stars"], self.screen_size
+        )
+        self.fixed_background = FixedBackground(
+            background_meta_data["fixed"], self.screen_size
+        )
+        self.background_compositor = BackgroundCompositor(
+            self.fixed_background, self.star_background, self.background
+        )
+
+    def start_session(self) -> None:
+        if self.background_compositor is None:
+            self.load_backgrounds()
+
+        difficulty = self.difficulty
+        self.next_enemy = difficulty["spawn_interval"]
+        self.appeared_enemy_number = 0
+        self.current_difficulty = 1
+        self.increase_difficulty_enemy_number = difficulty["enemies_per_level"]
+        self.show_increase_difficulty_text = False
+        self.show_increase_difficulty_counter = 0
+
+        self.player_ship = PlayerShip(
+            PLAYER_IMAGE,
+            PLAYER_SIZE,
+            (self.screen_size[0] // 2, self.screen_size[1] - 50),
+            difficulty["missile_cooldown"],
+        )
+        self.player_life = difficulty["player_life"]
+        self.session_time = 0.0
+        for enemy in self.enemy_container:
+            enemy.container_index = -1
+            self.enemy_pool.release(enemy)
+        self.enemy_container = []
+        for prototype in enemy_prototypes:
+            prototype.image
+        self.enemy_pool.prewarm(
+            enemy_prototypes[0], self.waves.pool_size, self.screen_size
+        )
+        self.waves.start(self)
+        self.missile_pool.clear()
+        self.alpha = 0
+        self.sessions += 1
+
+    def spawn_enemy(
+        self, prototype: EntityPrototype, position: tuple[float, float]
+    ) -> "Enemy":
+        enemy = self.enemy_pool.acquire(prototype, position, self.screen_size)
+        enemy.vy *= self.waves.speed_scale()
+        enemy.container_index = len(self.enemy_container)
+        self.enemy_container.append(enemy)
+        return enemy
+
+    def despawn_enemy(self, enemy: "Enemy") -> None:
+        index = enemy.container_index
+        last = self.enemy_container.pop()
+        if last is not enemy:
+            self.enemy_container[index] = last
+            last.container_index = index
+        enemy.container_index = -1
+        self.enemy_pool.release(enemy)
+
+    def state_digest(self) -> str:
+        state = (
+            self.scene,
+            self.sessions,
+            self.kills,
+            self.player_life,
+            tuple(self.player_ship.rect) if self.player_ship is not None else None,
+            [tuple(enemy.rect) for enemy in self.enemy_container],
+            [tuple(missile.rect) for missile in self.missile_pool.active],
+            self.rng.getstate(),
+        )
+        return hashlib.sha1(repr(state).encode()).hexdigest()[:16]
+
+    def frame_counts(self) -> dict[str, int]:
+        counts = {
+            "enemies": len(self.enemy_container),
+            **self.missile_pool.stats(),
+            "enemy_pool": self.enemy_pool.allocated,
+            "retargets": self.guidance.retargets,
+            "animation_passes": self.animations.passes,
+        }
+        counts.update(text_cache.stats())
+        counts.update(audio.stats())
+        counts.update(self.layers.stats())
+        return counts
+
+
+class KeyState:
+    def __init__(self, pressed: frozenset[int] = frozenset()) -> None:
+        self.pressed = pressed
+
+    def __getitem__(self, key: int) -> bool:
+        return key in self.pressed
+
+
+TRACKED_KEYS = (
+    pygame.K_w,
+    pygame.K_a,
+    pygame.K_s,
+    pygame.K_d,
+    pygame.K_UP,
+    pygame.K_DOWN,
+    pygame.K_LEFT,
+    pygame.K_RIGHT,
+    pygame.K_SPACE,
+)
+
+
+def encode_keys(keys) -> int:
+    mask = 0
+    for bit, key in enumerate(TRACKED_KEYS):
+        if keys[key]:
+            mask |= 1 << bit
+    return mask
+
+
+def decode_keys(mask: int) -> KeyState:
+    return KeyState(
+        frozenset(key for bit, key in enumerate(TRACKED_KEYS) if mask & (1 << bit))
+    )
+
+
+class InputRecorder:
+    def __init__(self, path: str, seed: int) -> None:
+        self.file = open(path, "wb")
+        self.file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, seed))
+        self.run: list | None = None
+        self.frames = 0
+
+    def record(self, dt: float, keys) -> None:
+        mask = encode_keys(keys)
+        run = self.run
+        if run is not None and run[1] == dt and run[2] == mask and run[0] < 0xFFFF:
+            run[0] += 1
+        else:
+            self.flush_run()
+            self.run = [1, dt, mask]
+        self.frames += 1
+
+    def flush_run(self) -> None:
+        if self.run is not None:
+            self.file.write(REPLAY_RUN.pack(*self.run))
+            self.run = None
+
+    def close(self) -> None:
+        self.flush_run()
+        self.file.close()
+
+
+class InputReplay:
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, self.seed = REPLAY_HEADER.unpack_from(data, 0)
+        if magic != REPLAY_MAGIC:
+            raise ValueError(f"{path} is not an input log")
+        if version != REPLAY_VERSION:
+            # Simulation changes make older logs play out a different game.
+            raise ValueError(
+                f"{path} is a version {version} input log; this build replays "
+                f"version {REPLAY_VERSION}"
+            )
+        body = data[REPLAY_HEADER.size:]
+        body = body[:len(body) - len(body) % REPLAY_RUN.size]
+        decoded: dict[int, KeyState] = {}
+        self.runs = []
+        for count, dt, mask in REPLAY_RUN.iter_unpack(body):
+            if mask not in decoded:
+                decoded[mask] = decode_keys(mask)
+            self.runs.append((count, dt, decoded[mask]))
+        self.frames = sum(count for count, _, _ in self.runs)
+
+    def __iter__(self):
+        for count, dt, keys in self.runs:
+            for _ in range(count):
+                yield dt, keys
+
 
 class Entity:
     def __init__(
@@ -55,49 +729,76 @@ class Entity:
         image_size: tuple[int, int],
         position: tuple[int, int],
         image: pygame.Surface | None = None,
+        mask: pygame.mask.Mask | None = None,
     ) -> None:
-        if image is not None:
-            self.image = scale_image_by_size(image, image_size)
+        if image is not None and mask is not None:
+            self.image = image
+            self.mask = mask
+        elif image is not None:
+            image = scale_image_by_size(image, image_size)
+            self.mask = pygame.mask.from_surface(image)
+            self.image = create_outline(image)
         else:
-            self.image = scale_image_by_size(load_image(image_path), image_size)
+            self.image, self.mask = get_sprite(image_path, image_size)
         self.image_size = image_size
-        self.image = create_outline(self.image)
-        self.mask = pygame.mask.from_surface(self.image)
         self.rect = self.image.get_frect(center=position)
         self.x, self.y = position
+        self.vx = self.vy = 0.0
+        self.snapshot()
 
-    def draw(self, surface: pygame.Surface) -> None:
-        surface.blit(self.image, self.rect)
+    def snapshot(self) -> None:
+        self.previous_x = self.rect.x
+        self.previous_y = self.rect.y
 
-    def update(self, dt: float) -> None:
-        pass
+    def draw_position(self, alpha: float = 1.0) -> pygame.FRect | tuple[float, float]:
+        if alpha >= 1.0:
+            return self.rect
+        x, y = self.previous_x, self.previous_y
+        return x + (self.rect.x - x) * alpha, y + (self.rect.y - y) * alpha
 
-    def collide_with(self, other: "Entity") -> bool:
-        return (
+    def draw(self, surface: pygame.Surface, alpha: float = 1.0) -> None:
+        surface.blit(self.image, self.draw_position(alpha))
+
+    def update(self, dt: float) -> None:
+        self.x += self.vx * dt
+        self.y += self.vy * dt
+
+    def collide_with(self, other: "Entity", mode: str = COLLIDE_MASK) -> bool:
+        if mode != COLLIDE_MASK:
+            return narrow_phase(self.rect, self.mask, other.rect, other.mask, mode)
+        rect, other_rect = self.rect, other.rect
+        return rect.colliderect(other_rect) and (
             self.mask.overlap(
-                other.mask, (other.rect.x - self.rect.x, other.rect.y - self.rect.y)
+                other.mask, (int(other_rect.x - rect.x), int(other_rect.y - rect.y))
             )
             is not None
         )
 
+def sync_rects(entities: list[Entity]) -> None:
+    for entity in entities:
+        entity.rect.center = entity.x, entity.y
+
+
 class PlayerShip(Entity):
     def __init__(
-        self, image_path: str, image_size: tuple[int, int], position: tuple[int, int]
+        self,
+        image_path: str,
+        image_size: tuple[int, int],
+        position: tuple[int, int],
+        missile_cooldown: float,
     ) -> None:
         super().__init__(image_path, image_size, position)
         self.speed = 200
         self.direction = pygame.math.Vector2(0, 0)
-        self.missile_cooldown = 0.5
+        self.missile_cooldown = missile_cooldown
 
     def update(self, dt: float) -> None:
         if self.direction.magnitude() > 0:
             self.direction = self.direction.normalize()
 
-        self.x += self.direction.x * self.speed * dt
-        self.y += self.direction.y * self.speed * dt
-
-        self.rect.centerx = math.floor(self.x)
-        self.rect.centery = math.floor(self.y)
+        self.vx = self.direction.x * self.speed
+        self.vy = self.direction.y * self.speed
+        super().update(dt)
 
         self.missile_cooldown -= dt
 
@@ -107,79 +808,449 @@ class PlayerShip(Entity):
 class Enemy(Entity):
     def __init__(
         self,
+        prototype: EntityPrototype,
         position: tuple[int, int],
         screen_size: tuple[int, int],
     ) -> None:
-        super().__init__("", prototype.image_size, position, prototype.image)
+        super().__init__(
+            "", prototype.image_size, position, prototype.image, prototype.mask
+        )
         self.speed = prototype.speed
         self.direction = 1
+        self.vy = self.speed * self.direction
         self.screen_size = screen_size
         self.is_dead = False
+        self.generation = 0
+        self.container_index = -1
 
-    def update(self, dt: float) -> None:
-        self.rect.y += dt * self.speed * self.direction
+    def reset(
+        self,
+        prototype: EntityPrototype,
+        position: tuple[float, float],
+        screen_size: tuple[int, int],
+    ) -> None:
+        self.image = prototype.image
+        self.mask = prototype.mask
+        self.image_size = prototype.image_size
+        self.rect.size = self.image.get_size()
+        self.rect.center = position
+        self.x, self.y = position
+        self.snapshot()
+        self.speed = prototype.speed
+        self.direction = 1
+        self.vx = 0.0
+        self.vy = self.speed * self.direction
+        self.screen_size = screen_size
+        self.is_dead = False
 
     def mark_as_dead(self) -> None:
         self.is_dead = True
 
+class EnemyPool:
+    def __init__(self) -> None:
+        self.free: list[Enemy] = []
+        self.allocated = 0
+
+    def prewarm(
+        self, prototype: EntityPrototype, count: int, screen_size: tuple[int, int]
+    ) -> None:
+        while len(self.free) < count:
+            enemy = Enemy(prototype, (0, 0), screen_size)
+            enemy.mark_as_dead()
+            self.free.append(enemy)
+            self.allocated += 1
+
+    def acquire(
+        self,
+        prototype: EntityPrototype,
+        position: tuple[float, float],
+        screen_size: tuple[int, int],
+    ) -> Enemy:
+        if self.free:
+            enemy = self.free.pop()
+            enemy.reset(prototype, position, screen_size)
+            return enemy
+        self.allocated += 1
+        return Enemy(prototype, position, screen_size)
+
+    def release(self, enemy: Enemy) -> None:
+        # A reused enemy is alive again, so anything still holding it compares
+        # generations to tell it apart from the enemy it aimed at.
+        enemy.mark_as_dead()
+        enemy.generation += 1
+        self.free.append(enemy)
+
+
 class Missile(Entity):
     def __init__(
         self,
+        prototype: EntityPrototype,
         position: tuple[float, float],
         team: str,
     ) -> None:
-        position = int(position[0]), int(position[1])
-        super().__init__("", prototype.image_size, position, image=prototype.image)
+        super().__init__(
+            "", prototype.image_size, position, prototype.image, prototype.mask
+        )
         self.team = team
         self.direction = (
             pygame.Vector2(0, -1) if team == "player" else pygame.Vector2(0, 1)
         )
         self.speed = prototype.speed
+        self.vy = self.direction.y * self.speed
+        self.prototype = prototype
+        self.heading_key: int | None = None
+        self.pool_index = -1
 
-    def update(self, dt: float) -> None:
-        self.rect.y += self.direction.y * self.speed * dt
+    def reset(
+        self,
+        prototype: EntityPrototype,
+        position: tuple[float, float],
+        team: str,
+    ) -> None:
+        self.prototype = prototype
+        self.heading_key = None
+        self.image = prototype.image
+        self.mask = prototype.mask
+        self.image_size = prototype.image_size
+        self.rect.size = self.image.get_size()
+        self.rect.center = position
+        self.x, self.y = position
+        self.snapshot()
+        self.team = team
+        self.direction.update(0, -1 if team == "player" else 1)
+        self.speed = prototype.speed
+        self.vx = 0.0
+        self.vy = self.direction.y * self.speed
+
+    def face(self, heading: float) -> None:
+        key = self.prototype.rotation_key(heading)
+        if key == self.heading_key:
+            return
+        self.heading_key = key
+        self.image, self.mask = self.prototype.rotation(key)
+        self.rect.size = self.image.get_size()
+        self.rect.center = self.x, self.y
 
 
 class HomingMissile(Missile):
     def __init__(
         self,
+        prototype: EntityPrototype,
         position: tuple[float, float],
         team: str,
-        target: Enemy,
+        target: Enemy | None = None,
     ) -> None:
         super().__init__(prototype, position, team)
-        self.target = target
+        self.lock(target)
+        self.heading = math.atan2(self.direction.y, self.direction.x)
 
-    def update(self, dt: float) -> None:
-        if self.target.is_dead:
-            return super().update(dt)
+    def reset(
+        self,
+        prototype: EntityPrototype,
+        position: tuple[float, float],
+        team: str,
+        target: Enemy | None = None,
+    ) -> None:
+        super().reset(prototype, position, team)
+        self.lock(target)
+        self.heading = math.atan2(self.direction.y, self.direction.x)
 
-        self.direction.x = self.target.x - self.rect.x
-        self.direction.y = self.target.y - self.rect.y
-        if self.direction.magnitude() > 0:
-            self.direction = self.direction.normalize()
+    def lock(self, target: Enemy | None) -> None:
+        self.target = target
+        self.target_generation = target.generation if target is not None else -1
 
-        self.rect.x += self.direction.x * self.speed * dt
-        self.rect.y += self.direction.y * self.speed * dt
+    def has_target(self) -> bool:
+        target = self.target
+        return (
+            target is not None
+            and not target.is_dead
+            and target.generation == self.target_generation
+        )
+
+    def steer(self, heading: float) -> None:
+        self.heading = heading
+        self.direction.update(math.cos(heading), math.sin(heading))
+        self.vx = self.direction.x * self.speed
+        self.vy = self.direction.y * self.speed
+        self.face(math.degrees(heading))
 
 
 class DiagonalMissile(Missile):
     def __init__(
         self,
+        prototype: EntityPrototype,
         position: tuple[float, float],
         team: str,
         angle: int,
     ) -> None:
         super().__init__(prototype, position, team)
+        self.aim(angle)
+
+    def reset(
+        self,
+        prototype: EntityPrototype,
+        position: tuple[float, float],
+        team: str,
+        angle: int,
+    ) -> None:
+        super().reset(prototype, position, team)
+        self.aim(angle)
+
+    def aim(self, angle: int) -> None:
         self.angle = math.radians(angle)
         self.direction.x = math.cos(self.angle)
         self.direction.y = math.sin(self.angle)
         self.direction = self.direction.normalize()
-        self.image = pygame.transform.rotate(self.image, -angle + 90)
+        self.vx = self.direction.x * self.speed
+        self.vy = self.direction.y * self.speed
+        self.face(angle)
+
+
+class MissilePool:
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.active: list[Missile] = []
+        self.free: dict[type[Missile], list[Missile]] = {}
+        self.allocated = 0
+        self.high_water_mark = 0
+
+    def __len__(self) -> int:
+        return len(self.active)
+
+    def prewarm(self, missile_class: type[Missile], count: int, *args) -> None:
+        free = self.free.setdefault(missile_class, [])
+        for _ in range(count):
+            free.append(missile_class(*args))
+            self.allocated += 1
+
+    def acquire(self, missile_class: type[Missile], *args) -> Missile | None:
+        if len(self.active) >= self.capacity:
+            return None
+        free = self.free.get(missile_class)
+        if free:
+            missile = free.pop()
+            missile.reset(*args)
+        else:
+            missile = missile_class(*args)
+            self.allocated += 1
+        missile.pool_index = len(self.active)
+        self.active.append(missile)
+        self.high_water_mark = max(self.high_water_mark, len(self.active))
+        return missile
+
+    def release(self, missile: Missile) -> None:
+        index = missile.pool_index
+        last = self.active.pop()
+        if last is not missile:
+            self.active[index] = last
+            last.pool_index = index
+        missile.pool_index = -1
+        self.free.setdefault(type(missile), []).append(missile)
+
+    def clear(self) -> None:
+        for missile in reversed(self.active):
+            self.release(missile)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "missiles": len(self.active),
+            "pool_capacity": self.capacity,
+            "pool_peak": self.high_water_mark,
+            "pool_allocated": self.allocated,
+        }
+
+
+class MissileFactory:
+    def __init__(self, name: str, prototype: EntityPrototype) -> None:
+        self.name = name
+        self.prototype = prototype
+
+    def shoot(
+        self, pool: MissilePool, position: tuple[float, float], enemies: list[Enemy]
+    ) -> None:
+        pool.acquire(Missile, self.prototype, position, "player")
+
+
+class DiagonalMissileFactory(MissileFactory):
+    angles = (-120, -90, -60)
+
+    def shoot(
+        self, pool: MissilePool, position: tuple[float, float], enemies: list[Enemy]
+    ) -> None:
+        for angle in self.angles:
+            pool.acquire(DiagonalMissile, self.prototype, position, "player", angle)
+
+
+class HomingMissileFactory(MissileFactory):
+    def shoot(
+        self, pool: MissilePool, position: tuple[float, float], enemies: list[Enemy]
+    ) -> None:
+        # Targets are acquired by HomingGuidance on the next steering pass.
+        pool.acquire(HomingMissile, self.prototype, position, "player")
 
-    def update(self, dt: float) -> None:
-        self.rect.x += self.direction.x * self.speed * dt
-        self.rect.y += self.direction.y * self.speed * dt
+
+class SpatialHash:
+    def __init__(self, cell_size: int) -> None:
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list[Entity]] = {}
+
+    def _cell_range(self, rect: pygame.FRect) -> tuple[range, range]:
+        size = self.cell_size
+        return (
+            range(int(rect.left) // size, int(rect.right) // size + 1),
+            range(int(rect.top) // size, int(rect.bottom) // size + 1),
+        )
+
+    def clear(self) -> None:
+        self.cells.clear()
+
+    def insert(self, entity: Entity) -> None:
+        xs, ys = self._cell_range(entity.rect)
+        for cx in xs:
+            for cy in ys:
+                self.cells.setdefault((cx, cy), []).append(entity)
+
+    def rebuild(self, entities: list[Entity]) -> None:
+        self.cells.clear()
+        for entity in entities:
+            self.insert(entity)
+
+    def query(self, rect: pygame.FRect) -> list[Entity]:
+        found = []
+        seen = set()
+        xs, ys = self._cell_range(rect)
+        for cx in xs:
+            for cy in ys:
+                for entity in self.cells.get((cx, cy), ()):
+                    if id(entity) in seen:
+                        continue
+                    seen.add(id(entity))
+                    if entity.rect.colliderect(rect):
+                        found.append(entity)
+        return found
+
+
+class TargetIndex:
+    def __init__(self, cell_size: int) -> None:
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list[Enemy]] = {}
+        self.extent = (0, 0, 0, 0)
+
+    def rebuild(self, enemies: list[Enemy]) -> None:
+        cells = self.cells
+        cells.clear()
+        size = self.cell_size
+        for enemy in enemies:
+            if not enemy.is_dead:
+                cells.setdefault(
+                    (int(enemy.x // size), int(enemy.y // size)), []
+                ).append(enemy)
+        if cells:
+            xs = [cx for cx, _ in cells]
+            ys = [cy for _, cy in cells]
+            self.extent = (min(xs), min(ys), max(xs), max(ys))
+
+    def _ring(self, cx: int, cy: int, ring: int):
+        if ring == 0:
+            yield cx, cy
+            return
+        for dx in range(-ring, ring + 1):
+            yield cx + dx, cy - ring
+            yield cx + dx, cy + ring
+        for dy in range(-ring + 1, ring):
+            yield cx - ring, cy + dy
+            yield cx + ring, cy + dy
+
+    def nearest(self, x: float, y: float) -> Enemy | None:
+        cells = self.cells
+        if not cells:
+            return None
+        size = self.cell_size
+        cx, cy = int(x // size), int(y // size)
+        left, top, right, bottom = self.extent
+        rings = max(cx - left, right - cx, cy - top, bottom - cy)
+        best = None
+        best_distance = math.inf
+        for ring in range(rings + 1):
+            for cell in self._ring(cx, cy, ring):
+                for enemy in cells.get(cell, ()):
+                    distance = (enemy.x - x) ** 2 + (enemy.y - y) ** 2
+                    if distance < best_distance:
+                        best, best_distance = enemy, distance
+            # Anything in the next ring is at least ring * size away.
+            if best is not None and (ring * size) ** 2 >= best_distance:
+                break
+        return best
+
+
+class HomingGuidance:
+    def __init__(self, turn_rate: float = HOMING_TURN_RATE, cell_size: int = 128) -> None:
+        self.turn_rate = math.radians(turn_rate)
+        self.targets = TargetIndex(cell_size)
+        self.retargets = 0
+
+    def steer(self, missiles: list[Missile], enemies: list[Enemy], dt: float) -> None:
+        homing = [missile for missile in missiles if type(missile) is HomingMissile]
+        if not homing:
+            return
+        self.targets.rebuild(enemies)
+        for missile in homing:
+            if not missile.has_target():
+                missile.lock(self.targets.nearest(missile.x, missile.y))
+                if missile.target is not None:
+                    self.retargets += 1
+
+        guided = [missile for missile in homing if missile.target is not None]
+        if not guided:
+            return
+        max_turn = self.turn_rate * dt
+        if np is not None:
+            state = np.array(
+                [
+                    (
+                        missile.x,
+                        missile.y,
+                        missile.heading,
+                        missile.target.x,
+                        missile.target.y,
+                    )
+                    for missile in guided
+                ]
+            )
+            desired = np.arctan2(state[:, 4] - state[:, 1], state[:, 3] - state[:, 0])
+            turn = (desired - state[:, 2] + math.pi) % math.tau - math.pi
+            headings = (state[:, 2] + np.clip(turn, -max_turn, max_turn)).tolist()
+        else:
+            headings = []
+            for missile in guided:
+                desired = math.atan2(
+                    missile.target.y - missile.y, missile.target.x - missile.x
+                )
+                turn = (desired - missile.heading + math.pi) % math.tau - math.pi
+                headings.append(missile.heading + max(-max_turn, min(max_turn, turn)))
+
+        for missile, heading in zip(guided, headings):
+            missile.steer(heading)
+
+
+def find_collisions(
+    missiles: list[Missile],
+    enemies: list[Enemy],
+    grid: SpatialHash,
+    mode: str = COLLIDE_MASK,
+) -> list[tuple[Missile, Enemy]]:
+    grid.rebuild(enemies)
+    hits = []
+    hit_enemies = set()
+    for missile in missiles:
+        for enemy in grid.query(missile.rect):
+            if id(enemy) in hit_enemies:
+                continue
+            if missile.collide_with(enemy, mode):
+                hits.append((missile, enemy))
+                hit_enemies.add(id(enemy))
+                break
+    return hits
 
 class Counter:
     def __init__(self, interval: float, max_index: int) -> None:
@@ -206,34 +1277,845 @@ class Counter:
         self.counter = 0
 
 
-class AnimationCounter:
-    def __init__(self, change: float, max_index: int) -> None:
-        self.change = change
-        self.counter = 0
-        self.index = 0
-        self.max_index = max_index
+def read_ase_durations(path: str) -> list[float]:
+    with open(path, "rb") as f:
+        _, magic, frames = ASE_HEADER.unpack(f.read(ASE_HEADER.size))
+        if magic != ASE_MAGIC:
+            raise ValueError(f"{path} is not an Aseprite file")
+        f.seek(ASE_HEADER_SIZE)
+        durations = []
+        for _ in range(frames):
+            size, frame_magic, _, duration = ASE_FRAME.unpack(f.read(ASE_FRAME.size))
+            if frame_magic != ASE_FRAME_MAGIC:
+                raise ValueError(f"{path} has a corrupt frame header")
+            durations.append(duration / 1000)
+            f.seek(size - ASE_FRAME.size, os.SEEK_CUR)
+    return durations
+
+
+class AnimationClip:
+    def __init__(self, durations: list[float], loop: bool = True) -> None:
+        if not durations or min(durations) <= 0:
+            raise ValueError("animation frames need positive durations")
+        self.durations = list(durations)
+        self.loop = loop
+
+    def __len__(self) -> int:
+        return len(self.durations)
+
+    @classmethod
+    def from_ase(
+        cls, path: str, frame_time: float | None = None, loop: bool = True
+    ) -> "AnimationClip":
+        durations = read_ase_durations(path)
+        if frame_time is not None:
+            # Keep the file's relative timing but retime it around frame_time.
+            scale = frame_time * len(durations) / sum(durations)
+            durations = [duration * scale for duration in durations]
+        return cls(durations, loop)
+
+    @classmethod
+    def from_strip(cls, frames: int, frame_time: float, loop: bool = True) -> "AnimationClip":
+        return cls([frame_time] * frames, loop)
+
+
+def load_animation_clips(meta_data: dict[str, dict]) -> dict[str, AnimationClip]:
+    clips = {}
+    for name, meta in meta_data.items():
+        loop = meta.get("loop", True)
+        if "ase" in meta:
+            clip = AnimationClip.from_ase(meta["ase"], meta.get("frame_time"), loop)
+            if "frames" in meta and len(clip) != meta["frames"]:
+                raise ValueError(
+                    f"{meta['ase']} has {len(clip)} frames, expected {meta['frames']}"
+                )
+        else:
+            clip = AnimationClip.from_strip(meta["frames"], meta["frame_time"], loop)
+        clips[name] = clip
+    return clips
+
+
+class AnimationSystem:
+    def __init__(self, clips: dict[str, AnimationClip], capacity: int = 64) -> None:
+        # Every clip's frame durations live in one flat table, so an instance's
+        # current duration is table[base + frame].
+        self.clips: dict[str, tuple[int, int, bool]] = {}
+        table = []
+        for name, clip in clips.items():
+            self.clips[name] = (len(table), len(clip), clip.loop)
+            table.extend(clip.durations)
+        self.capacity = capacity
+        # A numpy pass only beats a plain loop once there are dozens of
+        # instances, so small systems such as the menu's stay on lists.
+        self.vectorized = np is not None and capacity >= ANIMATION_BATCH_SIZE
+        if self.vectorized:
+            self.table = np.array(table, dtype=np.float64)
+            self.base = np.zeros(capacity, dtype=np.int32)
+            self.length = np.ones(capacity, dtype=np.int32)
+            self.loop = np.ones(capacity, dtype=bool)
+            self.frame = np.zeros(capacity, dtype=np.int32)
+            self.elapsed = np.zeros(capacity, dtype=np.float64)
+            self.speed = np.zeros(capacity, dtype=np.float64)
+        else:
+            self.table = table
+            self.base = [0] * capacity
+            self.length = [1] * capacity
+            self.loop = [True] * capacity
+            self.frame = [0] * capacity
+            self.elapsed = [0.0] * capacity
+            self.speed = [0.0] * capacity
+        self.free = list(range(capacity - 1, -1, -1))
+        self.playing: list[int] = []
+        self.pending = 0.0
+        self.slack = math.inf
+        self.passes = 0
+
+    def __len__(self) -> int:
+        return self.capacity - len(self.free)
+
+    def play(self, name: str, speed: float = 1.0) -> int:
+        if not self.free:
+            raise RuntimeError("animation system is full")
+        self.flush()
+        index = self.free.pop()
+        base, length, loop = self.clips[name]
+        self.base[index] = base
+        self.length[index] = length
+        self.loop[index] = loop
+        self.frame[index] = 0
+        self.elapsed[index] = 0.0
+        self.speed[index] = speed
+        self.playing.append(index)
+        self.update_slack()
+        return index
+
+    def stop(self, index: int) -> None:
+        self.flush()
+        self.base[index] = 0
+        self.frame[index] = 0
+        self.elapsed[index] = 0.0
+        self.speed[index] = 0.0
+        self.playing.remove(index)
+        self.free.append(index)
+        self.update_slack()
+
+    def restart(self, index: int) -> None:
+        self.flush()
+        self.frame[index] = 0
+        self.elapsed[index] = 0.0
+        self.update_slack()
+
+    def get(self, index: int) -> int:
+        return int(self.frame[index])
+
+    def advance(self, dt: float) -> None:
+        # Between frame changes only the shared clock moves; the per-instance
+        # pass runs once the earliest pending frame change is due.
+        self.pending += dt
+        if self.pending < self.slack:
+            return
+        self.flush()
+        self.update_slack()
+
+    def flush(self) -> None:
+        dt, self.pending = self.pending, 0.0
+        if dt == 0.0:
+            return
+        self.passes += 1
+        if self.vectorized:
+            elapsed, frame = self.elapsed, self.frame
+            elapsed += self.speed * dt
+            while True:
+                duration = self.table[self.base + frame]
+                due = elapsed >= duration
+                if not due.any():
+                    break
+                # Carry the overshoot into the next frame instead of dropping it.
+                elapsed[due] -= duration[due]
+                frame[due] += 1
+                ended = frame >= self.length
+                frame[ended & self.loop] = 0
+                held = ended & ~self.loop
+                frame[held] = self.length[held] - 1
+                self.speed[held] = 0.0
+                elapsed[held] = 0.0
+            return
+        table = self.table
+        for index in self.playing:
+            speed = self.speed[index]
+            if speed == 0.0:
+                continue
+            elapsed = self.elapsed[index] + speed * dt
+            frame = self.frame[index]
+            base = self.base[index]
+            while elapsed >= table[base + frame]:
+                elapsed -= table[base + frame]
+                frame += 1
+                if frame >= self.length[index]:
+                    if not self.loop[index]:
+                        frame = self.length[index] - 1
+                        elapsed = 0.0
+                        self.speed[index] = 0.0
+                        break
+                    frame = 0
+            self.elapsed[index] = elapsed
+            self.frame[index] = frame
+
+    def update_slack(self) -> None:
+        if self.vectorized:
+            playing = self.speed > 0
+            if not playing.any():
+                self.slack = math.inf
+                return
+            remaining = self.table[self.base + self.frame] - self.elapsed
+            self.slack = float((remaining[playing] / self.speed[playing]).min())
+            return
+        self.slack = min(
+            (
+                (self.table[self.base[index] + self.frame[index]] - self.elapsed[index])
+                / self.speed[index]
+                for index in self.playing
+                if self.speed[index] > 0
+            ),
+            default=math.inf,
+        )
 
-    def add_counter(self, dt: float) -> None:
-        self.counter += dt
 
-    def add_index(self) -> None:
-        self.index += 1
-        self.index %= self.max_index
+def formation_offsets(
+    formation: str, count: int, spacing: float, columns: int = 0
+) -> list[tuple[float, float]]:
+    middle = (count - 1) / 2
+    if formation == "line":
+        return [((i - middle) * spacing, 0.0) for i in range(count)]
+    if formation == "v":
+        return [
+            ((i - middle) * spacing, -abs(i - middle) * spacing / 2) for i in range(count)
+        ]
+    if formation == "column":
+        return [(0.0, -i * spacing) for i in range(count)]
+    if formation == "grid":
+        columns = columns or math.ceil(math.sqrt(count))
+        return [
+            ((i % columns - (columns - 1) / 2) * spacing, -(i // columns) * spacing)
+            for i in range(count)
+        ]
+    raise ValueError(f"unknown formation {formation!r}")
+
+
+class WaveScheduler:
+    def __init__(self, data: dict) -> None:
+        self.data = data
+        self.pool_size = data.get("pool_size", 0)
+        self.curve = data.get("difficulty_curve", [[0, 1.0]])
+        stream = data.get("stream")
+        self.stream = stream["enemies"] if stream else []
+        self.timeline: list[tuple[float, int, str, object]] = []
+        self.sequence = 0
+        self.time = 0.0
+
+    def start(self, game: "Game") -> None:
+        self.timeline.clear()
+        self.time = 0.0
+        if self.stream:
+            self.schedule(game.next_enemy, "stream", None)
+        for wave in self.data.get("waves", ()):
+            self.schedule(wave["time"], "wave", wave)
+
+    def schedule(self, time: float, kind: str, payload) -> None:
+        heapq.heappush(self.timeline, (time, self.sequence, kind, payload))
+        self.sequence += 1
+
+    def speed_scale(self) -> float:
+        curve = self.curve
+        if self.time <= curve[0][0]:
+            return curve[0][1]
+        for (start, low), (end, high) in zip(curve, curve[1:]):
+            if self.time <= end:
+                return low + (high - low) * (self.time - start) / (end - start)
+        return curve[-1][1]
+
+    def update(self, game: "Game", dt: float) -> None:
+        self.time += dt
+        timeline = self.timeline
+        while timeline and timeline[0][0] <= self.time:
+            when, _, kind, payload = heapq.heappop(timeline)
+            if kind == "stream":
+                self.run_stream(game, when)
+            elif kind == "wave":
+                self.run_wave(game, when, payload)
+            else:
+                game.spawn_enemy(*payload)
+
+    def run_stream(self, game: "Game", when: float) -> None:
+        position = (
+            game.rng.randint(200, game.screen_size[0] - 200),
+            game.rng.randint(-100, -50),
+        )
+        game.spawn_enemy(enemy_prototype_map[game.rng.choice(self.stream)], position)
+        game.appeared_enemy_number += 1
+        if game.appeared_enemy_number >= game.increase_difficulty_enemy_number:
+            game.appeared_enemy_number = 0
+            interval_step = game.difficulty["spawn_interval_step"]
+            if game.next_enemy > interval_step:
+                game.next_enemy -= interval_step
+                game.current_difficulty += 1
+                game.increase_difficulty_enemy_number = int(
+                    game.increase_difficulty_enemy_number
+                    * game.difficulty["enemies_per_level_growth"]
+                )
+                game.show_increase_difficulty_text = True
+                game.show_increase_difficulty_counter = 0
+        self.schedule(when + game.next_enemy, "stream", None)
+
+    def run_wave(self, game: "Game", when: float, wave: dict) -> None:
+        offsets = formation_offsets(
+            wave["formation"],
+            wave.get("count", 1),
+            wave.get("spacing", 0),
+            wave.get("columns", 0),
+        )
+        half_width = max(abs(dx) for dx, _ in offsets) + 32
+        width = game.screen_size[0]
+        if half_width * 2 < width:
+            center_x = game.rng.uniform(half_width, width - half_width)
+        else:
+            center_x = width / 2
+        name = wave.get("enemy", "random")
+        interval = wave.get("burst_interval", 0)
+        for index, (dx, dy) in enumerate(offsets):
+            enemy_name = game.rng.choice(self.stream) if name == "random" else name
+            spawn = enemy_prototype_map[enemy_name], (center_x + dx, dy - 64)
+            if interval > 0 and index > 0:
+                self.schedule(when + index * interval, "spawn", spawn)
+            else:
+                game.spawn_enemy(*spawn)
+
+        repeat = wave.get("repeat", 0)
+        if repeat != 0:
+            self.schedule(
+                when + wave["every"], "wave", {**wave, "repeat": max(repeat - 1, -1)}
+            )
 
-    def sub_index(self) -> None:
-        self.index -= 1
-        self.index %= self.max_index
 
-    def is_change(self) -> bool:
-        return self.counter >= self.change
+class FrameScheduler:
+    def __init__(
+        self,
+        tick_rate: int = TICK_RATE,
+        max_ticks: int = MAX_TICKS_PER_FRAME,
+        max_frame_time: float = MAX_FRAME_TIME,
+    ) -> None:
+        self.dt = 1 / tick_rate
+        self.max_ticks = max_ticks
+        self.max_frame_time = max_frame_time
+        self.accumulator = 0.0
+        self.dropped_time = 0.0
+
+    def advance(self, frame_time: float) -> int:
+        self.accumulator += min(frame_time, self.max_frame_time)
+        ticks = min(int(self.accumulator / self.dt), self.max_ticks)
+        self.accumulator -= ticks * self.dt
+        if self.accumulator >= self.dt:
+            # Too far behind to catch up: drop the backlog instead of
+            # simulating ever more ticks per frame.
+            self.dropped_time += self.accumulator
+            self.accumulator %= self.dt
+        return ticks
+
+    @property
+    def alpha(self) -> float:
+        return self.accumulator / self.dt
+
+    def stats(self) -> dict[str, int]:
+        return {"dropped_ms": round(self.dropped_time * 1000)}
+
+
+class TextCache:
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.surfaces: OrderedDict[tuple, pygame.Surface] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(
+        self, font: pygame.Font, text: str, antialias: bool, color: tuple[int, int, int]
+    ) -> pygame.Surface:
+        key = (font, text, antialias, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def stats(self) -> dict[str, int]:
+        return {"text_hits": self.hits, "text_misses": self.misses}
+
+
+text_cache = TextCache(128)
+
+
+class PhaseTimer:
+    def __init__(self, profiler: "FrameProfiler", name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        elapsed = (time.perf_counter() - self.start) * 1000
+        phases = self.profiler.phases
+        phases[self.name] = phases.get(self.name, 0.0) + elapsed
+
+
+class FrameProfiler:
+    PHASES = (
+        "input",
+        "spawn",
+        "update",
+        "collision",
+        "audio",
+        "background",
+        "entities",
+        "hud",
+        "present",
+    )
+    null_phase = contextlib.nullcontext()
+
+    def __init__(self, history: int = 240) -> None:
+        self.enabled = False
+        self.show_overlay = False
+        self.frame_times: deque[float] = deque(maxlen=history)
+        self.phases: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+        self.trace: list[dict[str, float]] | None = None
+        self.frame = 0
+        self.frame_start = 0.0
+        self.dt = 0.0
+        self.font: pygame.Font | None = None
+
+    def start_trace(self) -> None:
+        self.enabled = True
+        self.trace = []
+
+    def phase(self, name: str) -> PhaseTimer | contextlib.nullcontext:
+        if not self.enabled:
+            return self.null_phase
+        return PhaseTimer(self, name)
+
+    def begin_frame(self, dt: float) -> None:
+        if not self.enabled:
+            return
+        self.phases = {}
+        self.dt = dt
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self, collect_counts: Callable[[], dict[str, int]]) -> None:
+        # Counts are only gathered for frames the profiler actually records.
+        if not self.enabled:
+            return
+        frame_ms = (time.perf_counter() - self.frame_start) * 1000
+        self.frame_times.append(frame_ms)
+        counts = self.counts = collect_counts()
+        if self.trace is not None:
+            record = {"frame": self.frame, "dt_ms": self.dt * 1000, "frame_ms": frame_ms}
+            for name in self.PHASES:
+                record[name] = self.phases.get(name, 0.0)
+            record.update(counts)
+            self.trace.append(record)
+        self.frame += 1
+
+    def percentile(self, percent: float) -> float:
+        if not self.frame_times:
+            return 0.0
+        ordered = sorted(self.frame_times)
+        index = min(len(ordered) - 1, max(0, math.ceil(percent / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def dump(self, path: str) -> None:
+        if not self.trace:
+            return
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump(self.trace, f)
+            return
+        fieldnames = list(dict.fromkeys(key for record in self.trace for key in record))
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, restval=0)
+            writer.writeheader()
+            writer.writerows(self.trace)
+
+    def draw(self, surface: pygame.Surface) -> pygame.Rect | None:
+        if not self.show_overlay:
+            return None
+        if self.font is None:
+            self.font = pygame.Font("assets/fonts/PixelMplus12-Regular.ttf", size=12)
+
+        panel = pygame.Rect(0, 0, 260, 200)
+        panel.topright = (surface.get_width() - 8, 8)
+        surface.fill((0, 0, 0), panel)
+
+        graph = pygame.Rect(panel.left + 8, panel.top + 8, panel.width - 16, 60)
+        budget_ms = 1000 / FPS
+        scale = graph.height / (budget_ms * 2)
+        budget_y = graph.bottom - budget_ms * scale
+        pygame.draw.line(surface, (80, 80, 80), (graph.left, budget_y), (graph.right, budget_y))
+        step_x = graph.width / self.frame_times.maxlen
+        for i, frame_ms in enumerate(self.frame_times):
+            x = graph.left + i * step_x
+            height = min(graph.height, frame_ms * scale)
+            color = (80, 220, 80) if frame_ms <= budget_ms else (230, 70, 70)
+            pygame.draw.line(surface, color, (x, graph.bottom), (x, graph.bottom - height))
+
+        lines = [
+            f"p50 {self.percentile(50):.2f}  p95 {self.percentile(95):.2f}  "
+            f"p99 {self.percentile(99):.2f} ms",
+        ]
+        lines.extend(
+            f"{name:<10} {self.phases.get(name, 0.0):6.2f} ms" for name in self.PHASES
+        )
+        lines.append("  ".join(f"{name} {value}" for name, value in self.counts.items()))
+        y = graph.bottom + 6
+        for line in lines:
+            text = self.font.render(line, False, WHITE)
+            surface.blit(text, (panel.left + 8, y))
+            y += text.get_height()
+        return panel
+
+
+def to_colorkey(surface: pygame.Surface) -> pygame.Surface:
+    opaque = pygame.mask.from_surface(surface, threshold=254).count()
+    visible = pygame.mask.from_surface(surface, threshold=0).count()
+    if opaque != visible:
+        result = surface.convert_alpha()
+        result.set_alpha(255, pygame.RLEACCEL)
+        return result
+    result = pygame.Surface(surface.get_size()).convert()
+    result.fill(COLORKEY)
+    result.blit(surface, (0, 0))
+    result.set_colorkey(COLORKEY, pygame.RLEACCEL)
+    return result
+
+
+class BackgroundCompositor:
+    def __init__(
+        self,
+        fixed: "FixedBackground",
+        stars: "MovedBackground",
+        animated: "AnimatedBackground",
+    ) -> None:
+        self.stars = stars
+        self.animated = animated
+        self.fixed_image = fixed.image.convert()
+
+        width, height = stars.image.get_size()
+        self.star_height = height
+        strip = pygame.Surface((width, height * 2), pygame.SRCALPHA)
+        strip.blit(stars.image, (0, 0))
+        strip.blit(stars.image, (0, height))
+        self.star_strip = to_colorkey(strip)
+        self.star_area = pygame.Rect(0, 0, width, height)
+
+        self.frames = [to_colorkey(image) for image in animated.images]
+
+        # Unconverted originals of every drawn layer. Nothing blits these, so a
+        # worker thread can rescale them while the drawn copies stay in use.
+        self.sources = [
+            (self.fixed_image, fixed.image),
+            (self.star_strip, strip),
+            *zip(self.frames, animated.images),
+        ]
+
+    def blit_sequence(self) -> list[tuple]:
+        self.star_area.top = self.star_height - self.stars.rect.top
+        return [
+            (self.fixed_image, (0, 0)),
+            (self.star_strip, (0, 0), self.star_area),
+            (self.frames[self.animated.frame], (0, 0)),
+        ]
+
+    def draw(self, screen: pygame.Surface) -> None:
+        screen.blits(self.blit_sequence(), doreturn=False)
+
+
+class RenderLayers:
+    def __init__(self, bounds: pygame.Rect, count: int = len(LAYER_PHASES)) -> None:
+        self.bounds = bounds
+        self.queues: list[list[tuple]] = [[] for _ in range(count)]
+        self.visible = [True] * count
+        self.culled = 0
+        self.last_blits = 0
+        self.last_culled = 0
+        self.output: tuple[pygame.Surface, "ScaledAssetCache"] | None = None
+        self.drew_output = False
+
+    def set_visible(self, layer: int, visible: bool) -> None:
+        self.visible[layer] = visible
+
+    def add(
+        self,
+        layer: int,
+        image: pygame.Surface,
+        position,
+        area: pygame.Rect | None = None,
+    ) -> None:
+        if area is None:
+            self.queues[layer].append((image, position))
+        else:
+            self.queues[layer].append((image, position, area))
+
+    def extend(self, layer: int, blits: list[tuple]) -> None:
+        self.queues[layer].extend(blits)
+
+    def add_entities(self, layer: int, entities, alpha: float = 1.0) -> None:
+        if not self.visible[layer]:
+            return
+        queue = self.queues[layer]
+        on_screen = self.bounds.colliderect
+        for entity in entities:
+            if on_screen(entity.rect):
+                queue.append((entity.image, entity.draw_position(alpha)))
+            else:
+                self.culled += 1
+
+    def draw(self, surface: pygame.Surface, profiler: "FrameProfiler") -> None:
+        output = self.output
+        if output is not None:
+            surface, cache = output
+            self.drew_output = True
+        blits = 0
+        for layer, queue in enumerate(self.queues):
+            if queue and self.visible[layer]:
+                with profiler.phase(LAYER_PHASES[layer]):
+                    if output is not None:
+                        queue = cache.map_blits(queue)
+                    surface.blits(queue, doreturn=False)
+                blits += len(queue)
+            self.queues[layer].clear()
+        self.last_blits = blits
+        self.last_culled = self.culled
+        self.culled = 0
+
+    def stats(self) -> dict[str, int]:
+        return {"blits": self.last_blits, "culled": self.last_culled}
+
+
+class ScaledAssetCache:
+    def __init__(self, scale: float, key=None) -> None:
+        self.scale = scale
+        self.key = key
+        self.surfaces: dict[pygame.Surface, pygame.Surface] = {}
+
+    @classmethod
+    def build(
+        cls,
+        scale: float,
+        key,
+        sources: list[tuple[pygame.Surface, pygame.Surface]],
+    ) -> "ScaledAssetCache":
+        # Runs on a worker thread, so it only scales. Converting depends on the
+        # display format and happens in finalize() on the main thread.
+        cache = cls(scale, key)
+        for drawn, source in sources:
+            width, height = source.get_size()
+            cache.surfaces[drawn] = pygame.transform.scale(
+                source, (round(width * scale), round(height * scale))
+            )
+        return cache
+
+    def finalize(self) -> "ScaledAssetCache":
+        for drawn, scaled in self.surfaces.items():
+            if drawn.get_colorkey() is not None or drawn.get_flags() & pygame.SRCALPHA:
+                self.surfaces[drawn] = to_colorkey(scaled)
+            else:
+                self.surfaces[drawn] = scaled.convert()
+        return self
+
+    def get(self, image: pygame.Surface) -> pygame.Surface:
+        scaled = self.surfaces.get(image)
+        if scaled is None:
+            width, height = image.get_size()
+            scaled = pygame.transform.scale(
+                image,
+                (max(1, round(width * self.scale)), max(1, round(height * self.scale))),
+            )
+            colorkey = image.get_colorkey()
+            if colorkey is not None:
+                scaled.set_colorkey(colorkey, pygame.RLEACCEL)
+            self.surfaces[image] = scaled
+        alpha = image.get_alpha()
+        if alpha is not None and alpha != scaled.get_alpha():
+            scaled.set_alpha(alpha)
+        return scaled
+
+    def map_blits(self, blits: list[tuple]) -> list[tuple]:
+        scale = self.scale
+        mapped = []
+        for blit in blits:
+            image, position = blit[0], blit[1]
+            position = (position[0] * scale, position[1] * scale)
+            if len(blit) == 2:
+                mapped.append((self.get(image), position))
+            else:
+                area = blit[2]
+                mapped.append(
+                    (
+                        self.get(image),
+                        position,
+                        pygame.Rect(
+                            round(area[0] * scale),
+                            round(area[1] * scale),
+                            round(area[2] * scale),
+                            round(area[3] * scale),
+                        ),
+                    )
+                )
+        return mapped
+
+
+class WindowPresenter:
+    def __init__(self, logical: pygame.Surface, mode: str) -> None:
+        self.logical = logical
+        self.mode = mode
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.build: Future | None = None
+        self.cache: ScaledAssetCache | None = None
+        self.resize_at: float | None = None
+        self.layout(pygame.display.get_surface())
+        self.target = self.window.subsurface(self.viewport)
+
+    def layout(self, window: pygame.Surface) -> None:
+        self.window = window
+        self.window_size = window.get_size()
+        width, height = self.window_size
+        logical_width, logical_height = self.logical.get_size()
+        self.scale = min(width / logical_width, height / logical_height)
+        self.viewport = pygame.Rect(
+            0, 0, round(logical_width * self.scale), round(logical_height * self.scale)
+        )
+        self.viewport.center = window.get_rect().center
+        window.fill(BLACK)
+
+    def resize(self, size: tuple[int, int]) -> None:
+        window = pygame.display.get_surface()
+        if size[0] < MIN_SCREEN_SIZE[0] or size[1] < MIN_SCREEN_SIZE[1]:
+            size = max(size[0], MIN_SCREEN_SIZE[0]), max(size[1], MIN_SCREEN_SIZE[1])
+            window = pygame.display.set_mode(
+                size, pygame.RESIZABLE, vsync=display_vsync
+            )
+        self.layout(window)
+        # Rebuilding waits until the window has stopped changing size.
+        self.resize_at = time.perf_counter()
+
+    def poll(self, game: "Game") -> None:
+        if self.mode != "cached":
+            return
+        if self.build is not None and self.build.done():
+            self.cache = self.build.result().finalize()
+            self.build = None
+        compositor = game.background_compositor
+        if compositor is None or self.build is not None:
+            return
+        if self.resize_at is not None:
+            if time.perf_counter() - self.resize_at < RESIZE_DEBOUNCE:
+                return
+            self.resize_at = None
+        key = (self.scale, id(compositor))
+        if self.cache is not None and self.cache.key == key:
+            return
+        sources = [
+            *compositor.sources,
+            (game.overlap_surface, game.overlap_surface.copy()),
+        ]
+        self.build = self.executor.submit(
+            ScaledAssetCache.build, self.scale, key, sources
+        )
+
+    def begin(self, game: "Game") -> None:
+        # The display surface is replaced when the window changes size, so the
+        # viewport is cut from it afresh every frame.
+        window = pygame.display.get_surface()
+        if window.get_size() != self.window_size:
+            self.resize(window.get_size())
+        self.window = pygame.display.get_surface()
+        self.target = self.window.subsurface(self.viewport)
+        self.poll(game)
+        cache = self.cache
+        key = (self.scale, id(game.background_compositor))
+        if cache is not None and cache.key == key:
+            game.layers.output = self.target, cache
+        else:
+            game.layers.output = None
+        game.layers.drew_output = False
+
+    def present(self, game: "Game", profiler: "FrameProfiler") -> None:
+        if not game.layers.drew_output:
+            pygame.transform.scale(self.logical, self.viewport.size, self.target)
+        profiler.draw(self.window)
+        pygame.display.flip()
+
+
+class DirtyRectRenderer:
+    def __init__(self, size: tuple[int, int]) -> None:
+        self.background = pygame.Surface(size).convert()
+        self.background_key = None
+        self.full_redraw = True
+        self.previous_rects: list[pygame.Rect] = []
+        self.dirty_rects: list[pygame.Rect] = []
+
+    def set_background(self, key) -> bool:
+        if key == self.background_key:
+            return False
+        self.background_key = key
+        self.full_redraw = True
+        return True
+
+    def redraw_all(self) -> None:
+        self.background_key = None
+        self.full_redraw = True
+        self.previous_rects = []
+
+    def begin(self, screen: pygame.Surface) -> None:
+        if self.full_redraw:
+            screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.previous_rects:
+                screen.blit(self.background, rect, rect)
+            self.dirty_rects.extend(self.previous_rects)
+        self.previous_rects = []
+
+    def mark(self, rect: pygame.Rect) -> None:
+        self.previous_rects.append(rect)
+        self.dirty_rects.append(rect)
+
+    def blit(
+        self, screen: pygame.Surface, image: pygame.Surface, position
+    ) -> pygame.Rect:
+        rect = screen.blit(image, position)
+        self.mark(rect)
+        return rect
+
+    def present(self) -> None:
+        if self.full_redraw:
+            pygame.display.update()
+        elif self.dirty_rects:
+            pygame.display.update(self.dirty_rects)
+        self.finish()
+
+    def finish(self) -> None:
+        self.dirty_rects = []
+        self.full_redraw = self.background_key is None
 
-    def reset_counter(self) -> None:
-        self.counter = 0
 
 class FixedBackground:
     def __init__(self, image_path: str, screen_size: tuple[int, int]) -> None:
-        self.image = load_image(image_path)
-        self.image = scale_image_by_size(self.image, screen_size)
+        self.image = load_scaled(image_path, screen_size)
         self.rect = self.image.get_rect()
         self.rect.topleft = (0, 0)
 
@@ -242,33 +2124,32 @@ class FixedBackground:
 
 
 class AnimatedBackground:
-    def __init__(self, image_path: str, screen_size: tuple[int, int]) -> None:
-        self.images = [load_image(image_path.format(INDEX=i)) for i in range(1, 12 + 1)]
-        self.images = [scale_image_by_size(image, screen_size) for image in self.images]
-        self.image = self.images[0]
-        self.rect = self.image.get_rect()
+    def __init__(
+        self, image_path: str, screen_size: tuple[int, int], animations: AnimationSystem
+    ) -> None:
+        self.images = [
+            load_scaled(image_path.format(INDEX=i), screen_size) for i in range(1, 12 + 1)
+        ]
+        self.rect = self.images[0].get_rect()
         self.rect.topleft = (0, 0)
-        self.frame = 0
-        self.frame_counter = 0
-        self.frame_change = 0.4
+        self.animations = animations
+        self.animation = animations.play("background")
+
+    @property
+    def frame(self) -> int:
+        return self.animations.get(self.animation)
+
+    @property
+    def image(self) -> pygame.Surface:
+        return self.images[self.frame]
 
     def draw(self, screen: pygame.Surface) -> None:
         screen.blit(self.image, self.rect)
 
-    def update(self, dt: float) -> None:
-        self.frame_counter += dt
-        if self.frame_counter >= self.frame_change:
-            self.frame_counter = 0
-            self.frame += 1
-            if self.frame >= len(self.images):
-                self.frame = 0
-            self.image = self.images[self.frame]
-
 
 class MovedBackground:
     def __init__(self, image_path: str, screen_size: tuple[int, int]) -> None:
-        self.image = load_image(image_path)
-        self.image = scale_image_by_size(self.image, screen_size)
+        self.image = load_scaled(image_path, screen_size)
         self.rect = self.image.get_rect()
         self.rect.topleft = (0, 0)
         self.y = 0
@@ -289,117 +2170,318 @@ enemies_meta_data = {
         "basic_1": {
             "image": "assets/image/enemy/basic_alien_1.png",
             "size": (64, 64),
+            "speed": 80,
         },
         "basic_2": {
             "image": "assets/image/enemy/basic_alien_2.png",
             "size": (64, 64),
+            "speed": 100,
         },
         "basic_3": {
             "image": "assets/image/enemy/basic_alien_3.png",
             "size": (64, 64),
+            "speed": 120,
         },
 }
 
+background_meta_data = {
+    "animated": "assets/image/background/background_1_{INDEX}.png",
+    "stars": "assets/image/background/background_2.png",
+    "fixed": "assets/image/background/background_3.png",
+}
+
+animation_meta_data = {
+    "menu_scene_bg": {
+        "ase": "assets/image/ui/menu_scene_bg.ase",
+        "frames": 12,
+        "frame_time": 0.13,
+    },
+    "menu_scene_alien_bg": {
+        "ase": "assets/image/ui/menu_scene_alien_bg.ase",
+        "frames": 12,
+        "frame_time": 0.08,
+    },
+    "cursor": {
+        "ase": "assets/image/ui/cursor.ase",
+        "frames": 6,
+        "frame_time": 0.09,
+    },
+    "background": {
+        "frames": 12,
+        "frame_time": 0.4,
+    },
+}
+
+PLAYER_IMAGE = "assets/image/player/player.png"
+PLAYER_SIZE = (64, 64)
+
+difficulty_meta_data = {
+    "spawn_interval": 4.0,
+    "spawn_interval_step": 0.3,
+    "enemies_per_level": 5,
+    "enemies_per_level_growth": 1.2,
+    "missile_cooldown": 0.5,
+    "player_life": 3,
+}
+
 missiles_meta_data = {
         "missile_1": {
             "image": "assets/image/missile/player_missile_1.png",
             "size":  (12, 16),
+            "speed": 400,
         },
         "missile_2": {
             "image": "assets/image/missile/player_missile_2.png",
             "size": (12, 16),
+            "speed": 300,
         },
 }
 
 # ---------- Initialize pygame and display ----------
+if "--headless" in sys.argv or "--replay" in sys.argv:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
 pygame.init()
-screen = pygame.display.set_mode(INITIAL_SCREEN_SIZE)
+display_vsync = 1 if "--vsync" in sys.argv else 0
+screen = pygame.display.set_mode(
+    INITIAL_SCREEN_SIZE,
+    pygame.RESIZABLE if "--resizable" in sys.argv else 0,
+    vsync=display_vsync,
+)
+asset_bundle = load_asset_bundle(BUNDLE_PATH)
 
 # ---------- Load Images ----------
-player_life_image = scale_image_by_size(
-    load_image("assets/image/player/life.png"), (64, 64)
-)
+assets = AssetManager()
 
-menu_scene_bg_list = [
-    scale_image_by_size(
-        load_image(f"assets/image/ui/menu_scene_bg_{n}.png"), INITIAL_SCREEN_SIZE
-    )
-    for n in range(1, 12 + 1)
-]
+menu_scene_bg_list = assets.images(
+    [f"assets/image/ui/menu_scene_bg_{n}.png" for n in range(1, 12 + 1)],
+    INITIAL_SCREEN_SIZE,
+)
 
-menu_scene_alien_bg_list = [
-    scale_image_by_size(
-        load_image(f"assets/image/ui/menu_scene_alien_bg_{n}.png"), INITIAL_SCREEN_SIZE
-    )
-    for n in range(1, 12 + 1)
-]
+menu_scene_alien_bg_list = assets.images(
+    [f"assets/image/ui/menu_scene_alien_bg_{n}.png" for n in range(1, 12 + 1)],
+    INITIAL_SCREEN_SIZE,
+)
 
-cursor_images = [
-    scale_image_by_size(
-        load_image(f"assets/image/ui/cursor_{n}.png"), (8 * 4, 9 * 4)
-    )
-    for n in range(1, 6 + 1)
-]
+cursor_paths = [f"assets/image/ui/cursor_{n}.png" for n in range(1, 6 + 1)]
+cursor_images = assets.images(cursor_paths, (8 * 4, 9 * 4))
 cursor_image_rect = cursor_images[0].get_rect()
 
-reversed_cursor_images = [
-    pygame.transform.flip(surf, True, False) for surf in cursor_images
-]
+reversed_cursor_images = assets.images(cursor_paths, (8 * 4, 9 * 4), flip=True)
 reversed_cursor_image_rect = reversed_cursor_images[0].get_rect()
 
 # ---------- Initialize Text Surface ----------
 #TODO Create new class which contains image-raw-data and image-rect
-start_game_text = scale_image_by_size(
-    load_image(f"assets/image/ui/start_game.png"), (70 * 4, 9 * 4)
-)
+start_game_text = assets.image("assets/image/ui/start_game.png", (70 * 4, 9 * 4))
 start_game_text_rect = start_game_text.get_rect()
 
-option_text_image = scale_image_by_size(
-    load_image("assets/image/ui/option.png"), (7 * 6 * 4, 9 * 4)
-)
+option_text_image = assets.image("assets/image/ui/option.png", (7 * 6 * 4, 9 * 4))
 option_text_rect = option_text_image.get_rect()
 
-quit_text_image = scale_image_by_size(
-    load_image("assets/image/ui/quit.png"), (7 * 4 * 4, 9 * 4)
-)
+quit_text_image = assets.image("assets/image/ui/quit.png", (7 * 4 * 4, 9 * 4))
 quit_text_rect = quit_text_image.get_rect()
 
-game_over_text = scale_image_by_size(
-    load_image("assets/image/ui/game_over.png"), (56 * 8, 8 * 8)
-)
+selection_rect_list = [start_game_text_rect, option_text_rect, quit_text_rect]
+
+# ---------- Sounds ----------
+sound_map = {
+    "shoot": assets.sound("assets/sound/bullet_shoot.wav", 0.1),
+    "hit": assets.sound("assets/sound/hit.wav"),
+    "select": assets.sound("assets/sound/select.wav", 0.1),
+}
+
+sound_meta_data = {
+    "shoot": {"category": "combat", "priority": 0, "min_interval": 0.05},
+    "hit": {"category": "combat", "priority": 1, "min_interval": 0.03},
+    "select": {"category": "ui", "priority": 0, "min_interval": 0.1},
+}
+
+audio_channel_budget = {
+    "combat": 6,
+    "ui": 2,
+}
+
+audio = AudioMixer(sound_map, sound_meta_data, audio_channel_budget)
+
+menu_assets = [
+    *menu_scene_bg_list,
+    *menu_scene_alien_bg_list,
+    *cursor_images,
+    *reversed_cursor_images,
+    start_game_text,
+    option_text_image,
+    quit_text_image,
+    *sound_map.values(),
+]
+
+# ---------- Game Scene Images ----------
+player_life_image = assets.image("assets/image/player/life.png", (64, 64))
+
+game_over_text = assets.image("assets/image/ui/game_over.png", (56 * 8, 8 * 8))
 game_over_text_rect = game_over_text.get_rect()
 
-place_space_to_continue_text = scale_image_by_size(
-    load_image("assets/image/ui/place_space_to_continue.png"), (161 * 4, 7 * 5)
+place_space_to_continue_text = assets.image(
+    "assets/image/ui/place_space_to_continue.png", (161 * 4, 7 * 5)
 )
 place_space_to_continue_text_rect = place_space_to_continue_text.get_rect()
 
-space_text_image = scale_image_by_size(
-    load_image(f"assets/image/ui/space.png"), (49 * 4, 7 * 4)
-)
+space_text_image = assets.image("assets/image/ui/space.png", (49 * 4, 7 * 4))
 space_text_rect = space_text_image.get_rect()
 
-selection_rect_list = [start_game_text_rect, option_text_rect, quit_text_rect]
+game_assets = [
+    player_life_image,
+    game_over_text,
+    place_space_to_continue_text,
+    space_text_image,
+    assets.image(PLAYER_IMAGE, PLAYER_SIZE),
+    *(
+        assets.image(meta["image"], meta["size"])
+        for meta in (*enemies_meta_data.values(), *missiles_meta_data.values())
+    ),
+    *assets.images(
+        [background_meta_data["animated"].format(INDEX=i) for i in range(1, 12 + 1)],
+        INITIAL_SCREEN_SIZE,
+    ),
+    assets.image(background_meta_data["stars"], INITIAL_SCREEN_SIZE),
+    assets.image(background_meta_data["fixed"], INITIAL_SCREEN_SIZE),
+]
 
-# ---------- Sounds ----------
-sound_map = {
-    "shoot": pygame.mixer.Sound("assets/sound/bullet_shoot.wav"),
-    "hit": pygame.mixer.Sound("assets/sound/hit.wav"),
-    "select": pygame.mixer.Sound("assets/sound/select.wav"),
-}
-sound_map["shoot"].set_volume(0.1)
-sound_map["select"].set_volume(0.1)
+# ---------- Prototypes ----------
+wave_data = load_wave_data(WAVES_PATH)
+for name, meta in wave_data.get("enemies", {}).items():
+    enemies_meta_data[name] = {
+        **enemies_meta_data[meta["base"]],
+        **{key: value for key, value in meta.items() if key != "base"},
+    }
+enemy_prototype_map = build_prototypes(enemies_meta_data)
+enemy_prototypes = list(enemy_prototype_map.values())
+missile_prototype_map = build_prototypes(missiles_meta_data)
+animation_clips = load_animation_clips(animation_meta_data)
+
+missile_factory_list = [
+    MissileFactory("Normal", missile_prototype_map["missile_1"]),
+    DiagonalMissileFactory("Diagonal", missile_prototype_map["missile_1"]),
+    HomingMissileFactory("Homing", missile_prototype_map["missile_2"]),
+]
 
 # ---------- Counters ----------
-menu_scene_counter = AnimationCounter(0.13, len(menu_scene_bg_list))
-menu_scene_alien_counter = AnimationCounter(0.08, len(menu_scene_alien_bg_list))
-cursor_animation_counter = AnimationCounter(0.09, len(cursor_images))
 cursor_move_counter = Counter(0.2, len(selection_rect_list))
 
-def draw_menu(game: Game, dt: float):
-    screen.fill(LIGHT_GRAY)
-    screen.blit(menu_scene_bg_list[menu_scene_counter.index], (0, 0))
-    screen.blit(menu_scene_alien_bg_list[menu_scene_alien_counter.index], (0, 0))
+
+def reset_menu_counters() -> None:
+    cursor_move_counter.counter = 0
+    cursor_move_counter.index = 0
+
+
+def play_sound(name: str) -> None:
+    audio.post(name)
+
+
+def start_game(game: Game) -> None:
+    if AssetManager.progress(game_assets) < 1:
+        game.loading_target = GAME_SCENE
+        game.scene = LOADING_SCENE
+        return
+    game.start_session()
+    game.scene = GAME_SCENE
+
+
+def update_loading(game: Game, dt: float, keys) -> None:
+    with game.profiler.phase("update"):
+        if game.loading_target == GAME_SCENE:
+            if AssetManager.progress(game_assets) == 1:
+                start_game(game)
+        elif AssetManager.progress(menu_assets) == 1:
+            game.scene = game.loading_target
+
+
+def draw_loading(game: Game, screen: pygame.Surface) -> None:
+    game.renderer.redraw_all()
+    with game.profiler.phase("hud"):
+        screen.fill(BLACK)
+        group = game_assets if game.loading_target == GAME_SCENE else menu_assets
+        bar = pygame.Rect(0, 0, 400, 16)
+        bar.center = game.screen_rect.center
+        pygame.draw.rect(screen, WHITE, bar, 2)
+        filled = bar.inflate(-6, -6)
+        filled.width = int(filled.width * AssetManager.progress(group))
+        screen.fill(WHITE, filled)
+
+        text = text_cache.render(game.font, "Loading", False, WHITE)
+        screen.blit(text, text.get_rect(midbottom=(bar.centerx, bar.top - 16)))
+
+
+def update_menu(game: Game, dt: float, keys) -> None:
+    with game.profiler.phase("update"):
+        cursor_move_counter.add_counter(dt)
+        if (keys[pygame.K_s] or keys[pygame.K_DOWN]) and cursor_move_counter.is_active():
+            cursor_move_counter.add_index()
+            cursor_move_counter.reset_counter()
+            play_sound("select")
+
+        if (keys[pygame.K_w] or keys[pygame.K_UP]) and cursor_move_counter.is_active():
+            cursor_move_counter.sub_index()
+            cursor_move_counter.reset_counter()
+            play_sound("select")
+
+        if keys[pygame.K_SPACE] and cursor_move_counter.is_active():
+            cursor_move_counter.reset_counter()
+            play_sound("select")
+            if cursor_move_counter.index == 0:
+                start_game(game)
+            elif cursor_move_counter.index == 1:
+                # TODO: MOVE TO OPTION MENU
+                pass
+            elif cursor_move_counter.index == 2:
+                game.running = False
+
+
+def draw_menu(game: Game, screen: pygame.Surface) -> None:
+    renderer = game.renderer
+    with game.profiler.phase("background"):
+        animations = game.animations
+        background_key = (
+            MENU_SCENE,
+            animations.get(game.menu_scene_animation),
+            animations.get(game.menu_scene_alien_animation),
+        )
+        if renderer.set_background(background_key):
+            draw_menu_background(game, renderer.background)
+        renderer.begin(screen)
+
+    with game.profiler.phase("hud"):
+        cursor_image_rect.centerx = (
+            game.screen_rect.centerx
+            - selection_rect_list[cursor_move_counter.index].width // 2
+            - 50
+        )
+        reversed_cursor_image_rect.centerx = (
+            game.screen_rect.centerx
+            + selection_rect_list[cursor_move_counter.index].width // 2
+            + 50
+        )
+        cursor_image_rect.centery = reversed_cursor_image_rect.centery = (
+            selection_rect_list[cursor_move_counter.index].centery
+        )
+
+        cursor_frame = game.animations.get(game.cursor_animation)
+        renderer.blit(screen, cursor_images[cursor_frame].get(), cursor_image_rect)
+        renderer.blit(
+            screen, reversed_cursor_images[cursor_frame].get(), reversed_cursor_image_rect
+        )
+
+
+def draw_menu_background(game: Game, background: pygame.Surface) -> None:
+    background.fill(LIGHT_GRAY)
+    animations = game.animations
+    background.blit(
+        menu_scene_bg_list[animations.get(game.menu_scene_animation)].get(), (0, 0)
+    )
+    background.blit(
+        menu_scene_alien_bg_list[animations.get(game.menu_scene_alien_animation)].get(),
+        (0, 0),
+    )
 
     start_game_text_rect.centerx = game.screen_rect.centerx
     start_game_text_rect.centery = game.screen_rect.centery + 220
@@ -408,295 +2490,538 @@ def draw_menu(game: Game, dt: float):
     quit_text_rect.centerx = game.screen_rect.centerx
     quit_text_rect.centery = option_text_rect.centery + 50
 
-    screen.blit(start_game_text, start_game_text_rect)
-    screen.blit(option_text_image, option_text_rect)
-    screen.blit(quit_text_image, quit_text_rect)
-
-    cursor_image_rect.centerx = (
-        game.screen_rect.centerx
-        - selection_rect_list[cursor_move_counter.index].width // 2
-        - 50
-    )
-    reversed_cursor_image_rect.centerx = (
-        game.screen_rect.centerx
-        + selection_rect_list[cursor_move_counter.index].width // 2
-        + 50
-    )
-    cursor_image_rect.centery = reversed_cursor_image_rect.centery = (
-        selection_rect_list[cursor_move_counter.index].centery
-    )
+    background.blit(start_game_text.get(), start_game_text_rect)
+    background.blit(option_text_image.get(), option_text_rect)
+    background.blit(quit_text_image.get(), quit_text_rect)
+
+
+def update_game(game: Game, dt: float, keys) -> None:
+    with game.profiler.phase("spawn"):
+        game.waves.update(game, dt)
+
+    with game.profiler.phase("update"):
+        game.star_background.update(dt)
+
+        for enemy in game.enemy_container:
+            enemy.snapshot()
+        for missile in game.missile_pool.active:
+            missile.snapshot()
+        game.player_ship.snapshot()
+
+        player_ship = game.player_ship
+        player_ship.direction.x = 0
+        player_ship.direction.y = 0
+        if keys[pygame.K_w]:
+            player_ship.direction.y = -1
+        elif keys[pygame.K_s]:
+            player_ship.direction.y = 1
+
+        if keys[pygame.K_a]:
+            player_ship.direction.x = -1
+        elif keys[pygame.K_d]:
+            player_ship.direction.x = 1
+
+        missile_factory_cursor = game.missile_factory_cursor
+        missile_factory_cursor.add_counter(dt)
+        if keys[pygame.K_LEFT] and missile_factory_cursor.is_active():
+            missile_factory_cursor.sub_index()
+            missile_factory_cursor.reset_counter()
+        if keys[pygame.K_RIGHT] and missile_factory_cursor.is_active():
+            missile_factory_cursor.add_index()
+            missile_factory_cursor.reset_counter()
+
+        enemy_container = game.enemy_container
+        if keys[pygame.K_SPACE] and player_ship.can_shoot():
+            missile_factory_list[missile_factory_cursor.index].shoot(
+                game.missile_pool, player_ship.rect.midtop, enemy_container
+            )
+            player_ship.missile_cooldown = game.difficulty["missile_cooldown"]
+            play_sound("shoot")
 
-    screen.blit(
-        cursor_images[cursor_animation_counter.index], cursor_image_rect
-    )
-    screen.blit(
-        reversed_cursor_images[cursor_animation_counter.index],
-        reversed_cursor_image_rect,
-    )
+        missile_pool = game.missile_pool
+        game.guidance.steer(missile_pool.active, enemy_container, dt)
 
-    menu_scene_counter.add_counter(dt)
-    if menu_scene_counter.is_change():
-        menu_scene_counter.add_index()
-        menu_scene_counter.reset_counter()
-
-    menu_scene_alien_counter.add_counter(dt)
-    if menu_scene_alien_counter.is_change():
-        menu_scene_alien_counter.add_index()
-        menu_scene_alien_counter.reset_counter()
-
-    cursor_animation_counter.add_counter(dt)
-    if cursor_animation_counter.is_change():
-        cursor_animation_counter.add_index()
-        cursor_animation_counter.reset_counter()
-
-    keys = pygame.key.get_pressed()
-
-    cursor_move_counter.add_counter(dt)
-    if (keys[pygame.K_s] or keys[pygame.K_DOWN]) and cursor_move_counter.is_active():
-        cursor_move_counter.add_index()
-        cursor_move_counter.reset_counter()
-        sound_map["select"].play()
-
-    if (keys[pygame.K_w] or keys[pygame.K_UP]) and cursor_move_counter.is_active():
-        cursor_move_counter.sub_index()
-        cursor_move_counter.reset_counter()
-        sound_map["select"].play()
-
-    if keys[pygame.K_SPACE] and cursor_move_counter.is_active():
-        cursor_move_counter.reset_counter()
-        sound_map["select"].play()
-        if cursor_move_counter.index == 0:
-            game.scene = GAME_SCENE
-        elif cursor_move_counter.index == 1:
-            # TODO: MOVE TO OPTION MENU
-            pass
-        elif cursor_move_counter.index == 2:
-            running = False
-
-def game_loop(game, dt):
-    enemy_spawn_timer += dt
-    if enemy_spawn_timer >= next_enemy:
-        enemy_spawn_timer = 0
-        e_pos = (random.randint(200, SCREEN_SIZE[0] - 200), (random.randint(-100, -50)))
-        e_prototype = random.choice(enemy_prototypes)
-        enemy_container.append(Enemy(e_prototype, e_pos, screen.get_size()))
-        appeared_enemy_number += 1
-        if appeared_enemy_number >= increase_difficulty_enemy_number:
-            appeared_enemy_number = 0
-            if next_enemy > 0.3:
-                next_enemy -= 0.3
-                current_difficulty += 1
-                increase_difficulty_enemy_number *= 1.2
-                increase_difficulty_enemy_number = int(increase_difficulty_enemy_number)
-                show_increase_difficulty_text = True
-
-    screen.fill(LIGHT_GRAY)
-
-    fixed_background.draw(screen)
-    star_background.draw(screen)
-    background.draw(screen)
-    background.update(dt)
-    star_background.update(dt)
-
-    player_ship.direction.x = 0
-    player_ship.direction.y = 0
-    keys = pygame.key.get_pressed()
-    if keys[pygame.K_w]:
-        player_ship.direction.y = -1
-    elif keys[pygame.K_s]:
-        player_ship.direction.y = 1
-
-    if keys[pygame.K_a]:
-        player_ship.direction.x = -1
-    elif keys[pygame.K_d]:
-        player_ship.direction.x = 1
-
-    missile_factory_cursor.add_counter(dt)
-    if keys[pygame.K_LEFT] and missile_factory_cursor.is_active():
-        missile_factory_cursor.sub_index()
-        missile_factory_cursor.reset_counter()
-    if keys[pygame.K_RIGHT] and missile_factory_cursor.is_active():
-        missile_factory_cursor.add_index()
-        missile_factory_cursor.reset_counter()
-
-    if keys[pygame.K_SPACE] and player_ship.can_shoot():
-        missile_factory_list[missile_factory_cursor.index].shoot(missile_container)
-        player_ship.missile_cooldown = 0.5
-        sound_map["shoot"].play()
-
-    for enemy in enemy_container:
-        enemy.update(dt)
-        enemy.draw(screen)
-        if enemy.rect.top > screen_size[1]:
-            enemy_container.remove(enemy)
-            enemy.mark_as_dead()
-            player_life -= 1
-            continue
+        for enemy in enemy_container:
+            enemy.update(dt)
+        for missile in missile_pool.active:
+            missile.update(dt)
+        player_ship.update(dt)
 
-    for missile in missile_container[:]:
-        missile.update(dt)
-        if missile.rect.bottom < 0 or missile.rect.top > screen_size[1]:
-            missile_container.remove(missile)
-            continue
-        missile.draw(screen)
+        sync_rects(enemy_container)
+        sync_rects(missile_pool.active)
+        sync_rects((player_ship,))
 
-    for missile in missile_container[:]:
         for enemy in enemy_container[:]:
-            if missile.collide_with(enemy):
-                missile_container.remove(missile)
-                enemy_container.remove(enemy)
-                enemy.mark_as_dead()
-
-    if player_life <= 0:
+            if enemy.rect.top > game.screen_size[1]:
+                game.despawn_enemy(enemy)
+                game.player_life -= 1
+
+        for missile in reversed(missile_pool.active):
+            # Homing and diagonal missiles can leave through the sides too.
+            if not game.screen_rect.colliderect(missile.rect):
+                missile_pool.release(missile)
+
+    with game.profiler.phase("collision"):
+        for missile, enemy in find_collisions(
+            missile_pool.active,
+            enemy_container,
+            game.collision_grid,
+            game.collision_mode,
+        ):
+            missile_pool.release(missile)
+            game.despawn_enemy(enemy)
+            game.kills += 1
+
+    with game.profiler.phase("update"):
+        if game.show_increase_difficulty_text:
+            game.show_increase_difficulty_counter += dt
+            if (
+                game.show_increase_difficulty_counter
+                > game.show_increase_difficulty_hidden_count
+            ):
+                game.show_increase_difficulty_counter = 0
+                game.show_increase_difficulty_text = False
+
+    game.session_time += dt
+    if game.player_life <= 0:
+        game.survival_times.append(game.session_time)
         game.scene = TRANSITION_TO_GAME_OVER_SCENE
 
-    current_missile_text_surface = font.render(missile_factory_list[missile_factory_cursor.index].name, False, WHITE)
+
+def submit_backgrounds(game: Game) -> None:
+    game.renderer.redraw_all()
+    game.layers.extend(LAYER_BACKGROUND, game.background_compositor.blit_sequence())
+
+
+def draw_game(game: Game, screen: pygame.Surface) -> None:
+    layers = game.layers
+    alpha = game.interpolation
+    submit_backgrounds(game)
+
+    with game.profiler.phase("entities"):
+        layers.add_entities(LAYER_ENEMIES, game.enemy_container, alpha)
+        layers.add_entities(LAYER_PROJECTILES, game.missile_pool.active, alpha)
+        layers.add_entities(LAYER_PLAYER, (game.player_ship,), alpha)
+
+    with game.profiler.phase("hud"):
+        submit_game_hud(game, layers)
+
+    layers.draw(screen, game.profiler)
+
+
+def submit_game_hud(game: Game, layers: RenderLayers) -> None:
+    screen_rect = game.screen_rect
+    current_missile_text_surface = text_cache.render(
+        game.font,
+        missile_factory_list[game.missile_factory_cursor.index].name,
+        False,
+        WHITE,
+    )
     current_missile_text_rect = current_missile_text_surface.get_rect()
 
     current_missile_text_rect.left = screen_rect.left + 30
     current_missile_text_rect.bottom = screen_rect.bottom - 30
 
-    screen.blit(current_missile_text_surface, current_missile_text_rect)
-
-    player_ship.update(dt)
-    player_ship.draw(screen)
+    layers.add(LAYER_HUD, current_missile_text_surface, current_missile_text_rect)
 
-    if show_increase_difficulty_text:
-        current_difficulty_surface = font.render(f"Current Diffuculty: {current_difficulty}", False, WHITE)
+    if game.show_increase_difficulty_text:
+        current_difficulty_surface = text_cache.render(
+            game.font, f"Current Diffuculty: {game.current_difficulty}", False, WHITE
+        )
         current_difficulty_rect = current_difficulty_surface.get_rect()
 
+        increase_difficulty_text_rect = game.increase_difficulty_text_rect
         increase_difficulty_text_rect.center = screen_rect.center
         current_difficulty_rect.centerx = screen_rect.centerx
-        current_difficulty_rect.centery = (increase_difficulty_text_rect.centery + 100)
-        screen.blit(increase_difficulty_text_surface, increase_difficulty_text_rect)
-        screen.blit(current_difficulty_surface, current_difficulty_rect)
-        show_increase_difficulty_counter += dt
-        if (show_increase_difficulty_counter > show_increase_difficulty_hidden_count):
-            show_increase_difficulty_counter = 0
-            show_increase_difficulty_text = False
-
-    for i in range(player_life):
-        screen.blit(player_life_image, (i * (player_life_image.get_width() + 5) + 5, 16))
-
-def main():
-    game = Game(screen)
-    pygame.display.set_caption(TITLE)
-    clock = pygame.time.Clock()
+        current_difficulty_rect.centery = increase_difficulty_text_rect.centery + 100
+        layers.add(
+            LAYER_HUD,
+            text_cache.render(
+                game.font, "Game difficulty has been increased.", False, WHITE
+            ),
+            increase_difficulty_text_rect,
+        )
+        layers.add(LAYER_HUD, current_difficulty_surface, current_difficulty_rect)
 
-    enemy_spawn_timer = 0
-    next_enemy = 4
-    appeared_enemy_number = 0
-    current_difficulty = 1
+    life_image = player_life_image.get()
+    for i in range(game.player_life):
+        layers.add(LAYER_HUD, life_image, (i * (life_image.get_width() + 5) + 5, 16))
 
-    background = AnimatedBackground(
-        "assets/image/background/background_1_{INDEX}.png", screen.get_size()
-    )
-    star_background = MovedBackground(
-        "assets/image/background/background_2.png", screen.get_size()
-    )
-    fixed_background = FixedBackground(
-        "assets/image/background/background_3.png", screen.get_size()
-    )
-    player_ship = PlayerShip(
-        "assets/image/player/player.png",
-        (64, 64),
-        (INITIAL_SCREEN_SIZE[0] // 2, INITIAL_SCREEN_SIZE[1] - 50),
-    )
 
-    player_life = 3
+def update_transition(game: Game, dt: float, keys) -> None:
+    with game.profiler.phase("update"):
+        game.player_ship.snapshot()
+        game.star_background.update(dt)
 
-    missile_container: list[Missile] = []
-    enemy_container: list[Enemy] = []
+        game.alpha += 120 * dt
+        if game.alpha >= 255:
+            game.scene = GAME_OVER_SCENE
 
-    missile_factory_cursor = Counter(0.2, 3)
 
-    increase_difficulty_text_surface = game.font.render("Game difficulty has been increased.", False, WHITE)
-    increase_difficulty_text_rect = increase_difficulty_text_surface.get_rect()
-    show_increase_difficulty_text = False
-    show_increase_difficulty_counter = 0
-    show_increase_difficulty_hidden_count = 2
+def draw_transition(game: Game, screen: pygame.Surface) -> None:
+    layers = game.layers
+    submit_backgrounds(game)
+    layers.add_entities(LAYER_PLAYER, (game.player_ship,), game.interpolation)
 
-    increase_difficulty_enemy_number = 5
+    game.overlap_surface.set_alpha(min(int(game.alpha), 255))
+    layers.add(LAYER_OVERLAY, game.overlap_surface, (0, 0))
+    layers.draw(screen, game.profiler)
 
-    overlap_surface = pygame.Surface(INITIAL_SCREEN_SIZE)
-    alpha = 0
-    overlap_surface.fill((0, 0, 0))
-    overlap_surface.set_alpha(alpha)
-    running = True
 
-    while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_q:
-                running = False
+def update_game_over(game: Game, dt: float, keys) -> None:
+    with game.profiler.phase("update"):
+        if keys[pygame.K_SPACE]:
+            play_sound("select")
+            game.scene = MENU_SCENE
 
-        dt = clock.tick(FPS) / 1000
 
-        if game.scene == MENU_SCENE:
-            draw_menu(game, dt)
-        elif game.scene == GAME_SCENE:
-            game_loop(game, dt)
-        elif game.scene == TRANSITION_TO_GAME_OVER_SCENE:
-            screen.fill(LIGHT_GRAY)
+def draw_game_over(game: Game, screen: pygame.Surface) -> None:
+    renderer = game.renderer
+    screen_rect = game.screen_rect
+    with game.profiler.phase("background"):
+        if renderer.set_background((GAME_OVER_SCENE,)):
+            draw_game_over_background(game, renderer.background)
+        renderer.begin(screen)
 
-            fixed_background.draw(screen)
-            star_background.draw(screen)
-            background.draw(screen)
-            background.update(dt)
-            star_background.update(dt)
+    with game.profiler.phase("hud"):
+        cursor_image_rect.centerx = (
+            screen_rect.centerx - space_text_rect.width // 2 - 50
+        )
+        reversed_cursor_image_rect.centerx = (
+            screen_rect.centerx + space_text_rect.width // 2 + 50
+        )
+        cursor_image_rect.centery = reversed_cursor_image_rect.centery = (
+            space_text_rect.centery
+        )
 
-            player_ship.draw(screen)
+        cursor_frame = game.animations.get(game.cursor_animation)
+        renderer.blit(screen, cursor_images[cursor_frame].get(), cursor_image_rect)
+        renderer.blit(
+            screen, reversed_cursor_images[cursor_frame].get(), reversed_cursor_image_rect
+        )
 
-            screen.blit(overlap_surface, (0, 0))
-            alpha += 2
 
-            if alpha >= 255:
-                game.scene = GAME_OVER_SCENE
-            overlap_surface.set_alpha(alpha)
+def draw_game_over_background(game: Game, background: pygame.Surface) -> None:
+    screen_rect = game.screen_rect
+    background.fill(BLACK)
 
-        elif game.scene == GAME_OVER_SCENE:
-            screen.fill(BLACK)
+    game_over_text_rect.centerx = screen_rect.centerx
+    game_over_text_rect.centery = screen_rect.centery - 150
 
-            game_over_text_rect.centerx = screen_rect.centerx
-            game_over_text_rect.centery = screen_rect.centery - 150
+    place_space_to_continue_text_rect.centerx = screen_rect.centerx
+    place_space_to_continue_text_rect.centery = screen_rect.centery
 
-            place_space_to_continue_text_rect.centerx = screen_rect.centerx
-            place_space_to_continue_text_rect.centery = screen_rect.centery
+    space_text_rect.centerx = screen_rect.centerx
+    space_text_rect.centery = screen_rect.centery + 200
 
-            space_text_rect.centerx = screen_rect.centerx
-            space_text_rect.centery = screen_rect.centery + 200
+    background.blit(game_over_text.get(), game_over_text_rect)
+    background.blit(
+        place_space_to_continue_text.get(), place_space_to_continue_text_rect
+    )
+    background.blit(space_text_image.get(), space_text_rect)
 
-            cursor_image_rect.centerx = (
-                screen_rect.centerx - space_text_rect.width // 2 - 50
-            )
-            reversed_cursor_image_rect.centerx = (
-                screen_rect.centerx + space_text_rect.width // 2 + 50
-            )
-            cursor_image_rect.centery = reversed_cursor_image_rect.centery = (
-                space_text_rect.centery
-            )
 
-            screen.blit(game_over_text, game_over_text_rect)
-            screen.blit(place_space_to_continue_text, place_space_to_continue_text_rect)
-            screen.blit(space_text_image, space_text_rect)
-            screen.blit(cursor_images[cursor_animation_counter.index], cursor_image_rect)
-            screen.blit(reversed_cursor_images[cursor_animation_counter.index], reversed_cursor_image_rect)
+scene_updates = {
+    LOADING_SCENE: update_loading,
+    MENU_SCENE: update_menu,
+    GAME_SCENE: update_game,
+    TRANSITION_TO_GAME_OVER_SCENE: update_transition,
+    GAME_OVER_SCENE: update_game_over,
+}
+
+scene_draws = {
+    LOADING_SCENE: draw_loading,
+    MENU_SCENE: draw_menu,
+    GAME_SCENE: draw_game,
+    TRANSITION_TO_GAME_OVER_SCENE: draw_transition,
+    GAME_OVER_SCENE: draw_game_over,
+}
 
-            cursor_animation_counter.add_counter(dt)
-            if cursor_animation_counter.is_change():
-                cursor_animation_counter.add_index()
-                cursor_animation_counter.reset_counter()
 
-            if pygame.key.get_pressed()[pygame.K_SPACE]:
-                sound_map["select"].play()
-                game.scene = MENU_SCENE
+def step(game: Game, dt: float, keys) -> None:
+    game.animations.advance(dt)
+    scene_updates[game.scene](game, dt, keys)
+
+
+def render(game: Game, screen: pygame.Surface) -> None:
+    scene_draws[game.scene](game, screen)
+
+
+def bot_input(frame: int, game: Game) -> KeyState:
+    pressed = {pygame.K_SPACE}
+    if game.scene == GAME_SCENE:
+        pressed.add(pygame.K_a if (frame // 90) % 2 else pygame.K_d)
+    return KeyState(frozenset(pressed))
+
+
+def headless_stats(
+    game: Game, frames: int, simulated_seconds: float, wall_seconds: float
+) -> dict[str, float]:
+    return {
+        "seed": game.seed,
+        "frames": frames,
+        "simulated_seconds": simulated_seconds,
+        "wall_seconds": wall_seconds,
+        "updates_per_second": frames / wall_seconds if wall_seconds > 0 else 0.0,
+        "sessions": game.sessions,
+        "kills": game.kills,
+        "digest": game.state_digest(),
+    }
+
+
+def run_headless(
+    game: Game,
+    frames: int,
+    dt: float = 1 / TICK_RATE,
+    input_source=bot_input,
+    recorder: InputRecorder | None = None,
+) -> dict[str, float]:
+    assets.wait()
+    profiler = game.profiler
+    start = time.perf_counter()
+    frame = 0
+    while frame < frames and game.running:
+        profiler.begin_frame(dt)
+        with profiler.phase("input"):
+            keys = input_source(frame, game)
+            if recorder is not None:
+                recorder.record(dt, keys)
+        step(game, dt, keys)
+        audio.update(dt)
+        profiler.end_frame(game.frame_counts)
+        frame += 1
+    return headless_stats(game, frame, frame * dt, time.perf_counter() - start)
+
+
+def run_replay(game: Game, replay: InputReplay) -> dict[str, float]:
+    assets.wait()
+    profiler = game.profiler
+    start = time.perf_counter()
+    frame = 0
+    simulated_seconds = 0.0
+    for dt, keys in replay:
+        if not game.running:
+            break
+        profiler.begin_frame(dt)
+        step(game, dt, keys)
+        audio.update(dt)
+        profiler.end_frame(game.frame_counts)
+        frame += 1
+        simulated_seconds += dt
+    return headless_stats(
+        game, frame, simulated_seconds, time.perf_counter() - start
+    )
 
-        pygame.display.update()
 
+def configure_profiler(
+    profiler: FrameProfiler, profile: bool, trace_path: str | None
+) -> None:
+    profiler.enabled = profile
+    profiler.show_overlay = profile
+    if trace_path is not None:
+        profiler.start_trace()
+
+
+def main(
+    seed: int | None = None,
+    profile: bool = False,
+    trace_path: str | None = None,
+    record_path: str | None = None,
+    tick_rate: int = TICK_RATE,
+    max_fps: int = FPS,
+    resizable: str | None = None,
+    collision_mode: str = COLLIDE_MASK,
+) -> None:
+    surface = screen
+    presenter = None
+    if resizable is not None:
+        surface = pygame.Surface(INITIAL_SCREEN_SIZE).convert()
+        presenter = WindowPresenter(surface, resizable)
+    game = Game(surface, seed)
+    game.collision_mode = collision_mode
+    game.missile_pool.prewarm(
+        Missile, 64, missile_prototype_map["missile_1"], (0, 0), "player"
+    )
+    profiler = game.profiler
+    configure_profiler(profiler, profile, trace_path)
+    pygame.display.set_caption(TITLE)
+    clock = pygame.time.Clock()
+    scheduler = FrameScheduler(tick_rate)
+
+    recorder = None
+    if record_path is not None:
+        # A replay starts with every asset loaded, so the recording must too.
+        assets.wait()
+        recorder = InputRecorder(record_path, game.seed)
+
+    # A crashed session is the one worth replaying, so the trailing input run
+    # and the trace are written out however the loop ends.
+    try:
+        while game.running:
+            frame_time = clock.tick(max_fps) / 1000
+            profiler.begin_frame(frame_time)
+
+            with profiler.phase("input"):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        game.running = False
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_q:
+                        game.running = False
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                        profiler.show_overlay = not profiler.show_overlay
+                        profiler.enabled = (
+                            profiler.show_overlay or profiler.trace is not None
+                        )
+                    if event.type == pygame.VIDEORESIZE and presenter is not None:
+                        presenter.resize(event.size)
+                keys = pygame.key.get_pressed()
+
+            dt = scheduler.dt
+            for _ in range(scheduler.advance(frame_time)):
+                if recorder is not None:
+                    recorder.record(dt, keys)
+                step(game, dt, keys)
+            with profiler.phase("audio"):
+                audio.update(frame_time)
+            game.interpolation = scheduler.alpha
+            if presenter is None:
+                render(game, screen)
+                overlay_rect = profiler.draw(screen)
+                if overlay_rect is not None:
+                    game.renderer.mark(overlay_rect)
+
+                with profiler.phase("present"):
+                    game.renderer.present()
+            else:
+                presenter.begin(game)
+                render(game, surface)
+                with profiler.phase("present"):
+                    presenter.present(game, profiler)
+                    game.renderer.finish()
+            profiler.end_frame(lambda: game.frame_counts() | scheduler.stats())
+    finally:
+        if recorder is not None:
+            recorder.close()
+        if trace_path is not None:
+            profiler.dump(trace_path)
     pygame.quit()
 
 
-if __name__ == "__main__":
-    main()
+def main_headless(
+    frames: int,
+    dt: float,
+    seed: int | None = None,
+    trace_path: str | None = None,
+    record_path: str | None = None,
+    replay_path: str | None = None,
+    collision_mode: str = COLLIDE_MASK,
+) -> None:
+    replay = InputReplay(replay_path) if replay_path is not None else None
+    game = Game(screen, replay.seed if replay is not None else seed)
+    game.collision_mode = collision_mode
+    configure_profiler(game.profiler, trace_path is not None, trace_path)
+    recorder = None
+    try:
+        if replay is not None:
+            stats = run_replay(game, replay)
+        else:
+            if record_path is not None:
+                recorder = InputRecorder(record_path, game.seed)
+            stats = run_headless(game, frames, dt, recorder=recorder)
+    finally:
+        if recorder is not None:
+            recorder.close()
+        if trace_path is not None:
+            game.profiler.dump(trace_path)
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    pygame.quit()
+
 
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=TITLE)
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="run the simulation without a window at unlimited speed",
+    )
+    parser.add_argument("--frames", type=int, default=FPS * 60 * 10)
+    parser.add_argument("--dt", type=float, default=1 / TICK_RATE)
+    parser.add_argument(
+        "--tick-rate",
+        type=int,
+        default=TICK_RATE,
+        help="fixed simulation updates per second",
+    )
+    parser.add_argument(
+        "--max-fps",
+        type=int,
+        default=FPS,
+        help="render frame cap; 0 renders uncapped",
+    )
+    parser.add_argument(
+        "--vsync", action="store_true", help="synchronise presents to the display"
+    )
+    parser.add_argument(
+        "--resizable",
+        action="store_true",
+        help="open a resizable window that scales the game to fit",
+    )
+    parser.add_argument(
+        "--scale-mode",
+        choices=("logical", "cached"),
+        default="cached",
+        help="scale each finished frame, or draw with per-size rescaled assets",
+    )
+    parser.add_argument(
+        "--collision",
+        choices=COLLISION_MODES,
+        default=COLLIDE_MASK,
+        help="pixel-perfect masks, masks behind a tight bounding-box test, "
+        "or fast approximate circles",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--profile", action="store_true", help="show the frame profiler overlay (F3)"
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        default=None,
+        help="write per-frame timings to PATH (.csv or .json)",
+    )
+    parser.add_argument(
+        "--record", metavar="PATH", default=None, help="record input to PATH"
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="PATH",
+        default=None,
+        help="replay an input recording headlessly at unlimited speed",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.headless or args.replay is not None:
+        main_headless(
+            args.frames,
+            args.dt,
+            args.seed,
+            args.trace,
+            args.record,
+            args.replay,
+            args.collision,
+        )
+    else:
+        main(
+            args.seed,
+            args.profile,
+            args.trace,
+            args.record,
+            args.tick_rate,
+            0 if args.vsync else args.max_fps,
+            args.scale_mode if args.resizable else None,
+            args.collision,
+        )
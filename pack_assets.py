@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+os.environ["SPACE_INVADER_BUNDLE"] = ""
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import main  # noqa: E402
+import pygame  # noqa: E402
+
+PADDING = 1
+
+
+def collect_images() -> dict[tuple[str, tuple[int, int]], pygame.Surface]:
+    main.assets.wait()
+    main.Game(main.screen, 0).start_session()
+    images = {}
+    for path, size in main.requested_images:
+        image = main.load_image(path)
+        stored_size = (
+            min(size[0], image.get_width()),
+            min(size[1], image.get_height()),
+        )
+        images[(path, size)] = main.scale_image_by_size(image, stored_size)
+    return images
+
+
+def pack(
+    images: dict[tuple[str, tuple[int, int]], pygame.Surface], page_size: int
+) -> tuple[list[pygame.Surface], dict[tuple[str, tuple[int, int]], tuple[int, pygame.Rect]]]:
+    placements = {}
+    page_heights: list[int] = []
+    page_widths: list[int] = []
+    x = y = shelf_height = 0
+    order = sorted(images, key=lambda key: images[key].get_height(), reverse=True)
+    for key in order:
+        width, height = images[key].get_size()
+        if not page_heights or x + width > page_widths[-1]:
+            x = 0
+            y += shelf_height
+            shelf_height = 0
+        if not page_heights or y + height > page_size:
+            page_widths.append(max(page_size, width))
+            page_heights.append(0)
+            x = y = shelf_height = 0
+        placements[key] = (len(page_heights) - 1, pygame.Rect(x, y, width, height))
+        x += width + PADDING
+        shelf_height = max(shelf_height, height + PADDING)
+        page_heights[-1] = max(page_heights[-1], y + height)
+
+    pages = [
+        pygame.Surface((width, height), pygame.SRCALPHA)
+        for width, height in zip(page_widths, page_heights)
+    ]
+    for key, (page, rect) in placements.items():
+        pages[page].blit(images[key], rect)
+    return pages, placements
+
+
+def write_bundle(
+    path: str,
+    pages: list[pygame.Surface],
+    placements: dict[tuple[str, tuple[int, int]], tuple[int, pygame.Rect]],
+) -> None:
+    blobs = [pygame.image.tobytes(page, "RGBA") for page in pages]
+    page_index = []
+    offset = 0
+    for page, blob in zip(pages, blobs):
+        page_index.append(
+            {"size": list(page.get_size()), "offset": offset, "length": len(blob)}
+        )
+        offset += len(blob)
+    index = {
+        "pages": page_index,
+        "images": [
+            {"path": path, "size": list(size), "page": page, "rect": list(rect)}
+            for (path, size), (page, rect) in sorted(placements.items())
+        ],
+    }
+    index_bytes = json.dumps(index).encode()
+    with open(path, "wb") as f:
+        f.write(main.BUNDLE_HEADER.pack(main.BUNDLE_MAGIC, main.BUNDLE_VERSION, len(index_bytes)))
+        f.write(index_bytes)
+        for blob in blobs:
+            f.write(blob)
+
+
+def measure_cold_start(bundle_path: str, runs: int) -> float:
+    code = (
+        "import time; start = time.perf_counter(); import main; "
+        "main.assets.wait(main.menu_assets); "
+        "print(time.perf_counter() - start)"
+    )
+    env = dict(os.environ, SPACE_INVADER_BUNDLE=bundle_path)
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]) * 1000)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Pack pre-scaled startup images into a texture atlas bundle"
+    )
+    parser.add_argument("--output", default="assets/bundle.bin")
+    parser.add_argument("--page-size", type=int, default=2048)
+    parser.add_argument(
+        "--measure",
+        type=int,
+        default=0,
+        metavar="RUNS",
+        help="time cold start with and without the bundle over RUNS runs",
+    )
+    args = parser.parse_args()
+
+    images = collect_images()
+    pages, placements = pack(images, args.page_size)
+    write_bundle(args.output, pages, placements)
+    print(
+        f"packed {len(placements)} images into {len(pages)} pages "
+        f"({os.path.getsize(args.output) / 2**20:.1f} MiB) -> {args.output}"
+    )
+
+    if args.measure:
+        without_ms = measure_cold_start("", args.measure)
+        with_ms = measure_cold_start(args.output, args.measure)
+        print(f"cold start without bundle: {without_ms:.1f} ms")
+        print(f"cold start with bundle:    {with_ms:.1f} ms")
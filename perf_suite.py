@@ -0,0 +1,310 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import_start = time.perf_counter()
+import main  # noqa: E402
+
+IMPORT_MS = (time.perf_counter() - import_start) * 1000
+
+SCENE_KINDS = ("enemy", "missile", "homing", "diagonal")
+SCENES = {
+    "idle": {},
+    "light": {"enemy": 8, "missile": 16},
+    "busy": {"enemy": 32, "missile": 64, "homing": 8, "diagonal": 24},
+    "swarm": {"enemy": 96, "missile": 192, "homing": 32, "diagonal": 96},
+}
+RENDER_PHASES = ("background", "entities", "hud")
+DEFAULT_BASELINE = "perf_baseline.json"
+DEFAULT_THRESHOLD = 0.25
+
+
+def parse_scene(spec: str) -> tuple[str, dict[str, int]]:
+    name, _, counts = spec.partition(":")
+    scene = {}
+    for item in filter(None, counts.split(",")):
+        kind, _, value = item.partition("=")
+        if kind not in SCENE_KINDS:
+            raise SystemExit(
+                f"unknown entity kind {kind!r}; use {', '.join(SCENE_KINDS)}"
+            )
+        scene[kind] = int(value)
+    return name, scene
+
+
+def layout_scene(
+    scene: dict[str, int], seed: int
+) -> list[tuple[str, tuple[float, float]]]:
+    # Positions stay in the upper part of the screen so nothing leaves it or
+    # reaches the player during the short timed step.
+    rng = random.Random(seed)
+    width, height = main.INITIAL_SCREEN_SIZE
+    return [
+        (kind, (rng.uniform(32, width - 32), rng.uniform(64, height * 0.6)))
+        for kind in SCENE_KINDS
+        for _ in range(scene.get(kind, 0))
+    ]
+
+
+def populate(game: main.Game, layout: list[tuple[str, tuple[float, float]]]) -> None:
+    # Without a timeline nothing spawns during the step, and the wave clock at
+    # zero keeps enemy speeds off the difficulty curve.
+    game.waves.timeline.clear()
+    game.waves.time = 0.0
+    for enemy in game.enemy_container[:]:
+        game.despawn_enemy(enemy)
+    game.missile_pool.clear()
+    pool = game.missile_pool
+    for index, (kind, position) in enumerate(layout):
+        if kind == "enemy":
+            prototype = main.enemy_prototypes[index % len(main.enemy_prototypes)]
+            game.spawn_enemy(prototype, position)
+        elif kind == "missile":
+            pool.acquire(
+                main.Missile,
+                main.missile_prototype_map["missile_1"],
+                position,
+                "player",
+            )
+        elif kind == "homing":
+            pool.acquire(
+                main.HomingMissile,
+                main.missile_prototype_map["missile_2"],
+                position,
+                "player",
+            )
+        else:
+            angle = main.DiagonalMissileFactory.angles[index % 3]
+            pool.acquire(
+                main.DiagonalMissile,
+                main.missile_prototype_map["missile_1"],
+                position,
+                "player",
+                angle,
+            )
+    game.player_ship.x, game.player_ship.y = game.player_ship.rect.center
+
+
+def measure_startup() -> tuple[dict[str, float], main.Game]:
+    start = time.perf_counter()
+    main.assets.wait()
+    assets_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    game = main.Game(main.screen, 0)
+    game.start_session()
+    session_ms = (time.perf_counter() - start) * 1000
+    startup = {"import_ms": IMPORT_MS, "assets_ms": assets_ms, "session_ms": session_ms}
+    return startup, game
+
+
+def run_scene(
+    game: main.Game, scene: dict[str, int], frames: int, seed: int, repeats: int = 1
+) -> dict[str, float]:
+    # Noise on a shared machine only ever adds time, so the fastest of several
+    # repeats is the most stable figure to compare against a baseline.
+    runs = [time_scene(game, scene, frames, seed) for _ in range(repeats)]
+    return {name: min(run[name] for run in runs) for name in runs[0]}
+
+
+def time_scene(
+    game: main.Game, scene: dict[str, int], frames: int, seed: int
+) -> dict[str, float]:
+    layout = layout_scene(scene, seed)
+    profiler = game.profiler
+    profiler.enabled = True
+    dt = 1 / main.TICK_RATE
+    keys = main.KeyState()
+    samples = {"update": [], "collision": [], "render": [], "frame": []}
+    game.scene = main.GAME_SCENE
+    for _ in range(frames):
+        # Each timed step starts from the same scene, so the work per frame
+        # stays constant however many entities the last step destroyed.
+        populate(game, layout)
+        game.player_life = game.difficulty["player_life"]
+        profiler.begin_frame(dt)
+        start = time.perf_counter()
+        main.step(game, dt, keys)
+        main.render(game, main.screen)
+        frame_ms = (time.perf_counter() - start) * 1000
+        phases = profiler.phases
+        samples["update"].append(phases.get("update", 0.0))
+        samples["collision"].append(phases.get("collision", 0.0))
+        samples["render"].append(sum(phases.get(name, 0.0) for name in RENDER_PHASES))
+        samples["frame"].append(frame_ms)
+    result = {
+        f"{name}_ms": statistics.median(values) for name, values in samples.items()
+    }
+    result["p95_frame_ms"] = statistics.quantiles(samples["frame"], n=20)[-1]
+    return result
+
+
+def describe_machine(frames: int, repeats: int, seed: int) -> dict:
+    return {
+        "platform": platform.platform(),
+        "processor": platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "pygame": main.pygame.version.ver,
+        "numpy": main.np.__version__ if main.np is not None else None,
+        "video_driver": os.environ.get("SDL_VIDEODRIVER"),
+        "frames": frames,
+        "repeats": repeats,
+        "seed": seed,
+    }
+
+
+def load_baseline(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise SystemExit(
+            f"no baseline at {path}; record one with --save {path}"
+        ) from None
+
+
+def flatten(results: dict, counts: dict | None = None) -> dict[str, float]:
+    metrics = {f"startup.{name}": value for name, value in results["startup"].items()}
+    for scene, values in results["scenes"].items():
+        if counts is not None and counts.get(scene) != values["counts"]:
+            continue
+        for name, value in values.items():
+            if name != "counts":
+                metrics[f"{scene}.{name}"] = value
+    return metrics
+
+
+def compare(
+    current: dict, baseline: dict, threshold: float, min_delta_ms: float
+) -> list[tuple[str, float, float, bool]]:
+    rows = []
+    # A scene only compares against a baseline scene with the same counts.
+    counts = {
+        scene: values["counts"] for scene, values in baseline["scenes"].items()
+    }
+    base_metrics = flatten(baseline)
+    for name, value in flatten(current, counts).items():
+        if name not in base_metrics:
+            continue
+        base = base_metrics[name]
+        # Tiny phases are dominated by timer noise, so a regression must be
+        # both relatively and absolutely large.
+        failed = value > base * (1 + threshold) and value - base > min_delta_ms
+        rows.append((name, base, value, failed))
+    return rows
+
+
+def print_comparison(rows: list[tuple[str, float, float, bool]]) -> None:
+    width = max(len(name) for name, *_ in rows)
+    print(f"{'metric':<{width}} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, base, value, failed in rows:
+        change = (value - base) / base * 100 if base > 0 else 0.0
+        status = "  REGRESSED" if failed else ""
+        print(
+            f"{name:<{width}} {base:>10.3f} {value:>10.3f} {change:>+7.1f}%{status}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Scene benchmarks with a stored baseline"
+    )
+    parser.add_argument(
+        "--scene",
+        metavar="NAME:KIND=N,...",
+        action="append",
+        help=f"synthetic scene to time; kinds are {', '.join(SCENE_KINDS)}",
+    )
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=5,
+        help="time each scene this many times and keep the fastest",
+    )
+    parser.add_argument(
+        "--baseline",
+        metavar="PATH",
+        nargs="?",
+        const=DEFAULT_BASELINE,
+        help="compare against a stored baseline and fail on regressions",
+    )
+    parser.add_argument(
+        "--save",
+        metavar="PATH",
+        nargs="?",
+        const=DEFAULT_BASELINE,
+        help="store these results as the new baseline",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=None,
+        help="allowed slowdown as a fraction of the baseline; defaults to the "
+        f"threshold stored with the baseline, or {DEFAULT_THRESHOLD}",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=0.05,
+        help="slowdowns smaller than this never count as regressions",
+    )
+    args = parser.parse_args()
+    if args.frames < 2:
+        parser.error("--frames must be at least 2 to compute percentiles")
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+    baseline = load_baseline(args.baseline) if args.baseline else None
+
+    scenes = dict(map(parse_scene, args.scene)) if args.scene else SCENES
+    startup, game = measure_startup()
+    threshold = args.threshold
+    if threshold is None:
+        threshold = (baseline or {}).get("threshold", DEFAULT_THRESHOLD)
+    results = {
+        "machine": describe_machine(args.frames, args.repeats, args.seed),
+        "threshold": threshold,
+        "startup": startup,
+        "scenes": {},
+    }
+    for name, scene in scenes.items():
+        results["scenes"][name] = {
+            "counts": {kind: scene.get(kind, 0) for kind in SCENE_KINDS},
+            **run_scene(game, scene, args.frames, args.seed, args.repeats),
+        }
+
+    for name, value in startup.items():
+        print(f"{name:>12} {value:>10.1f}")
+    print(
+        f"{'scene':>8} {'update':>8} {'collide':>8} {'render':>8} "
+        f"{'frame':>8} {'p95':>8}  (ms)"
+    )
+    for name, values in results["scenes"].items():
+        print(
+            f"{name:>8} {values['update_ms']:>8.3f} {values['collision_ms']:>8.3f} "
+            f"{values['render_ms']:>8.3f} {values['frame_ms']:>8.3f} "
+            f"{values['p95_frame_ms']:>8.3f}"
+        )
+
+    failed = False
+    if baseline is not None:
+        machine = baseline.get("machine")
+        if machine is not None and machine != results["machine"]:
+            print(f"note: baseline was captured on {machine}")
+        rows = compare(results, baseline, threshold, args.min_delta_ms)
+        print_comparison(rows)
+        failed = any(row[3] for row in rows)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
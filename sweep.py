@@ -0,0 +1,184 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import main  # noqa: E402
+
+
+def strafe_policy(frame: int, game: main.Game) -> main.KeyState:
+    return main.bot_input(frame, game)
+
+
+def still_policy(frame: int, game: main.Game) -> main.KeyState:
+    return main.KeyState(frozenset({main.pygame.K_SPACE}))
+
+
+def dodge_policy(frame: int, game: main.Game) -> main.KeyState:
+    pressed = {main.pygame.K_SPACE}
+    if game.scene == main.GAME_SCENE and game.enemy_container:
+        lowest = max(game.enemy_container, key=lambda enemy: enemy.y)
+        if lowest.x < game.player_ship.x - 8:
+            pressed.add(main.pygame.K_a)
+        elif lowest.x > game.player_ship.x + 8:
+            pressed.add(main.pygame.K_d)
+    return main.KeyState(frozenset(pressed))
+
+
+POLICIES = {
+    "strafe": strafe_policy,
+    "still": still_policy,
+    "dodge": dodge_policy,
+}
+
+
+def run_instance(job: dict) -> dict:
+    game = main.Game(main.screen, job["seed"], job["difficulty"])
+    game.profiler = main.FrameProfiler(history=job["frames"])
+    game.profiler.enabled = True
+    stats = main.run_headless(game, job["frames"], job["dt"], POLICIES[job["policy"]])
+    survival = game.survival_times
+    return {
+        **job["difficulty"],
+        "policy": job["policy"],
+        "seed": job["seed"],
+        "frames": stats["frames"],
+        "sessions": stats["sessions"],
+        "deaths": len(survival),
+        "mean_survival": statistics.fmean(survival) if survival else game.session_time,
+        "kills": stats["kills"],
+        "update_us": stats["wall_seconds"] / max(stats["frames"], 1) * 1e6,
+        "p95_update_us": game.profiler.percentile(95) * 1000,
+        "p99_update_us": game.profiler.percentile(99) * 1000,
+    }
+
+
+def parse_value(name: str, kind: type, value: str) -> float:
+    try:
+        return kind(value)
+    except ValueError:
+        raise SystemExit(
+            f"{name} takes {kind.__name__} values, not {value!r}"
+        ) from None
+
+
+def parse_grid(specs: list[str]) -> list[dict[str, float]]:
+    axes = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in main.difficulty_meta_data:
+            raise SystemExit(f"unknown parameter {name!r}")
+        kind = type(main.difficulty_meta_data[name])
+        axes[name] = [parse_value(name, kind, value) for value in values.split(",")]
+    return [dict(zip(axes, values)) for values in itertools.product(*axes.values())]
+
+
+def build_jobs(
+    grid: list[dict[str, float]],
+    policies: list[str],
+    seeds: int,
+    base_seed: int,
+    frames: int,
+    dt: float,
+) -> list[dict]:
+    rng = random.Random(base_seed)
+    seed_list = [rng.randrange(2**32) for _ in range(seeds)]
+    return [
+        {
+            "difficulty": difficulty,
+            "policy": policy,
+            "seed": seed,
+            "frames": frames,
+            "dt": dt,
+        }
+        for difficulty in grid
+        for policy in policies
+        for seed in seed_list
+    ]
+
+
+def write_results(rows: list[dict], path: str) -> None:
+    if path.endswith(".json"):
+        with open(path, "w") as f:
+            json.dump(rows, f, indent=2)
+        return
+    fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_results(rows: list[dict]) -> None:
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    widths = {
+        column: max(len(column), *(len(format_cell(row.get(column))) for row in rows))
+        for column in columns
+    }
+    print(" ".join(f"{column:>{widths[column]}}" for column in columns))
+    for row in rows:
+        print(
+            " ".join(
+                f"{format_cell(row.get(column)):>{widths[column]}}" for column in columns
+            )
+        )
+
+
+def format_cell(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel difficulty sweeps")
+    parser.add_argument(
+        "--grid",
+        metavar="NAME=V1,V2",
+        action="append",
+        default=[],
+        help=f"parameter values to sweep; one of {', '.join(main.difficulty_meta_data)}",
+    )
+    parser.add_argument("--policy", choices=POLICIES, action="append")
+    parser.add_argument("--seeds", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--frames", type=int, default=main.TICK_RATE * 60 * 5)
+    parser.add_argument("--dt", type=float, default=1 / main.TICK_RATE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--output", metavar="PATH", help="write rows to PATH (.csv or .json)"
+    )
+    args = parser.parse_args()
+
+    jobs = build_jobs(
+        parse_grid(args.grid),
+        args.policy or ["strafe"],
+        args.seeds,
+        args.seed,
+        args.frames,
+        args.dt,
+    )
+    start = time.perf_counter()
+    # Forked workers would inherit the asset loader without its threads, so
+    # each worker starts a fresh interpreter instead.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+        rows = list(pool.map(run_instance, jobs))
+    wall_seconds = time.perf_counter() - start
+
+    print_results(rows)
+    print(
+        f"{len(jobs)} runs on {args.workers} workers in {wall_seconds:.2f} s "
+        f"({sum(row['frames'] for row in rows) / wall_seconds:.0f} updates/s)"
+    )
+    if args.output:
+        write_results(rows, args.output)
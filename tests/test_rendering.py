@@ -0,0 +1,32 @@
+import pygame
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize("scene", [main.MENU_SCENE, main.GAME_OVER_SCENE])
+def test_dirty_rects_match_full_redraw(scene):
+    main.assets.wait()
+    game = main.Game(main.screen, 0)
+    game.scene = scene
+    dt = 1 / main.TICK_RATE
+    incremental = pygame.Surface(game.screen_size).convert()
+    full = pygame.Surface(game.screen_size).convert()
+    cursor = main.cursor_move_counter
+    start_index = cursor.index
+    try:
+        for frame in range(240):
+            if frame % 60 == 59:
+                # Move the cursor so old positions must be erased.
+                cursor.index = (cursor.index + 1) % len(main.selection_rect_list)
+            game.animations.advance(dt)
+            main.render(game, incremental)
+            game.renderer.finish()
+            if frame % 40 == 39:
+                game.renderer.redraw_all()
+                main.render(game, full)
+                game.renderer.finish()
+                expected = pygame.image.tobytes(full, "RGB")
+                assert pygame.image.tobytes(incremental, "RGB") == expected
+    finally:
+        cursor.index = start_index
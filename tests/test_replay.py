@@ -0,0 +1,30 @@
+import pytest
+
+import main
+
+
+def test_replay_reproduces_recorded_digest(tmp_path):
+    path = tmp_path / "session.log"
+    game = main.Game(main.screen, 7)
+    recorder = main.InputRecorder(str(path), game.seed)
+    try:
+        recorded = main.run_headless(game, 3000, recorder=recorder)
+    finally:
+        recorder.close()
+
+    replay = main.InputReplay(str(path))
+    assert replay.seed == 7
+    replayed = main.run_replay(main.Game(main.screen, replay.seed), replay)
+
+    assert replayed["frames"] == recorded["frames"]
+    assert replayed["kills"] == recorded["kills"]
+    assert replayed["digest"] == recorded["digest"]
+
+
+def test_replay_rejects_other_versions(tmp_path):
+    path = tmp_path / "old.log"
+    path.write_bytes(
+        main.REPLAY_HEADER.pack(main.REPLAY_MAGIC, main.REPLAY_VERSION - 1, 0)
+    )
+    with pytest.raises(ValueError, match="version"):
+        main.InputReplay(str(path))
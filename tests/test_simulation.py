@@ -0,0 +1,98 @@
+import random
+
+import main
+
+
+def make_game() -> main.Game:
+    main.assets.wait()
+    game = main.Game(main.screen, 0)
+    game.start_session()
+    game.waves.timeline.clear()
+    return game
+
+
+def test_missile_pool_swap_remove_keeps_indices():
+    rng = random.Random(0)
+    pool = main.MissilePool(64)
+    prototype = main.missile_prototype_map["missile_1"]
+    for _ in range(500):
+        if pool.active and (len(pool) == pool.capacity or rng.random() < 0.45):
+            pool.release(rng.choice(pool.active))
+        else:
+            pool.acquire(main.Missile, prototype, (100.0, 100.0), "player")
+        assert all(m.pool_index == i for i, m in enumerate(pool.active))
+    released = set(map(id, pool.active))
+    pool.clear()
+    assert len(pool) == 0
+    assert released <= {id(m) for free in pool.free.values() for m in free}
+
+
+def test_despawn_enemy_swap_remove_keeps_indices():
+    rng = random.Random(1)
+    game = make_game()
+    for _ in range(500):
+        if game.enemy_container and rng.random() < 0.45:
+            enemy = rng.choice(game.enemy_container)
+            game.despawn_enemy(enemy)
+            assert enemy.container_index == -1
+        else:
+            prototype = rng.choice(main.enemy_prototypes)
+            game.spawn_enemy(prototype, (rng.uniform(0, 800), rng.uniform(0, 600)))
+        assert all(
+            enemy.container_index == i
+            for i, enemy in enumerate(game.enemy_container)
+        )
+    assert len({id(enemy) for enemy in game.enemy_container}) == len(
+        game.enemy_container
+    )
+
+
+def test_target_index_matches_brute_force():
+    rng = random.Random(2)
+    enemies = [
+        main.Enemy(
+            rng.choice(main.enemy_prototypes),
+            (rng.uniform(0, 800), rng.uniform(0, 600)),
+            main.INITIAL_SCREEN_SIZE,
+        )
+        for _ in range(120)
+    ]
+    for enemy in enemies[::7]:
+        enemy.mark_as_dead()
+    alive = [enemy for enemy in enemies if not enemy.is_dead]
+    index = main.TargetIndex(64)
+    index.rebuild(enemies)
+    for _ in range(500):
+        x, y = rng.uniform(-400, 1200), rng.uniform(-400, 1000)
+        found = index.nearest(x, y)
+        expected = min((e.x - x) ** 2 + (e.y - y) ** 2 for e in alive)
+        assert not found.is_dead
+        assert (found.x - x) ** 2 + (found.y - y) ** 2 == expected
+
+
+def test_target_index_empty():
+    index = main.TargetIndex(64)
+    index.rebuild([])
+    assert index.nearest(10.0, 10.0) is None
+
+
+def test_homing_missile_drops_reused_enemy():
+    game = make_game()
+    prototype = main.enemy_prototypes[0]
+    first = game.spawn_enemy(prototype, (100, 100))
+    second = game.spawn_enemy(prototype, (300, 100))
+    missile = game.missile_pool.acquire(
+        main.HomingMissile,
+        main.missile_prototype_map["missile_2"],
+        (100, 400),
+        "player",
+    )
+    game.guidance.steer(game.missile_pool.active, game.enemy_container, 1 / 60)
+    assert missile.target is first
+
+    game.despawn_enemy(first)
+    reused = game.spawn_enemy(prototype, (700, 50))
+    assert reused is first
+    assert not missile.has_target()
+    game.guidance.steer(game.missile_pool.active, game.enemy_container, 1 / 60)
+    assert missile.target is second